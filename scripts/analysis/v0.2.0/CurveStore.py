@@ -0,0 +1,133 @@
+# CurveStore.py
+# Columnar storage of growth curves for the phenotype microarray pipeline
+#
+# Author: Daniel A Cuevas
+# Created on 18 Oct. 2026
+# Updated on 18 Oct. 2026
+
+import pylab as py
+
+
+# Rows of the OD matrix checked together for their float32 rounding
+ROUND_CHUNK = 4096
+
+
+def asFloat64(values, rounded=False):
+    '''Return values as float64
+
+    With rounded, float32 values are rounded to the 6 significant digits
+    that float32 always holds. Values parsed from text with up to 6
+    significant digits so get back the float64 value they were parsed to,
+    and computations on them match those on float64 data. Only data known
+    to have at most 6 digits may be rounded, see CurveStore.rounded.
+    '''
+    values = py.asarray(values)
+    out = values.astype(py.float64)
+    if not rounded or values.dtype != py.float32:
+        return out
+    with py.errstate(divide='ignore', invalid='ignore'):
+        exp = py.floor(py.log10(py.absolute(out)))
+    sel = py.isfinite(exp) & (py.absolute(exp) <= 16)
+
+    # Each value is scaled to a 6 digit integer, dividing or multiplying by
+    # a power of ten that is exact in float64
+    digits = 5 - exp[sel]
+    scale = 10.0 ** py.absolute(digits)
+    up = digits >= 0
+    x = out[sel]
+    out[sel] = py.where(up, py.rint(x * scale) / scale,
+                        py.rint(x / scale) * scale)
+    return out
+
+
+class CurveStore:
+    '''Array-backed store of growth curves
+
+    Every curve occupies one row of a preallocated (curves x timepoints)
+    OD matrix. Clone, replicate, source and condition of each row are kept
+    in parallel integer arrays. Names are coded as indices into the
+    cloneNames, sourceNames and conditionNames lists. OD values are
+    stored as dtype, float32 halves the memory of the matrix. rounded is
+    True while asFloat64 rounding gives back every value stored.
+    '''
+    def __init__(self, maxCurves, numTime, dtype=float):
+        self.numCurves = 0
+        self.numTime = numTime
+
+        # Primary data structure: curves x timepoints
+        self.od = py.zeros((maxCurves, numTime), dtype=dtype)
+        self.length = py.zeros(maxCurves, dtype=int)  # Readings per curve
+        self.filter = py.zeros(maxCurves, dtype=bool)  # Filter flag per curve
+        self.rounded = True  # Stored values have at most 6 digits
+
+        # Index arrays (one entry per curve)
+        self.clone = py.zeros(maxCurves, dtype=int)
+        self.rep = py.zeros(maxCurves, dtype=int)
+        self.source = py.zeros(maxCurves, dtype=int)
+        self.condition = py.zeros(maxCurves, dtype=int)
+
+        # Name lists that the index arrays code into
+        self.cloneNames = []
+        self.sourceNames = []
+        self.conditionNames = []
+        self.__codes = ({}, {}, {})  # Name->code for clones/sources/conds
+
+        self.rows = {}  # Hash of (clone, rep, source, condition)->row
+
+    def __code(self, which, names, name):
+        '''Return integer code of a name, adding it if new'''
+        codes = self.__codes[which]
+        try:
+            return codes[name]
+        except KeyError:
+            codes[name] = len(names)
+            names.append(name)
+            return codes[name]
+
+    def addCurve(self, clone, rep, source, condition):
+        '''Register a curve and return its row in the OD matrix'''
+        key = (clone, rep, source, condition)
+        if key in self.rows:
+            return self.rows[key]
+
+        row = self.numCurves
+        self.clone[row] = self.__code(0, self.cloneNames, clone)
+        self.rep[row] = rep
+        self.source[row] = self.__code(1, self.sourceNames, source)
+        self.condition[row] = self.__code(2, self.conditionNames, condition)
+        self.rows[key] = row
+        self.numCurves += 1
+        return row
+
+    def getRow(self, clone, rep, source, condition):
+        '''Return row of a curve or None if it was never added'''
+        return self.rows.get((clone, rep, source, condition))
+
+    def getKey(self, row):
+        '''Return (clone, rep, source, condition) of a row'''
+        return (self.cloneNames[self.clone[row]], int(self.rep[row]),
+                self.sourceNames[self.source[row]],
+                self.conditionNames[self.condition[row]])
+
+    def getCurve(self, row):
+        '''Return view of the OD readings stored for a row'''
+        return self.od[row, :self.length[row]]
+
+    def setBlock(self, rows, values, lengths=None):
+        '''Store a (curves x timepoints) block of readings in given rows'''
+        numVals = values.shape[1]
+        self.od[rows, :numVals] = values
+        self.length[rows] = numVals if lengths is None else lengths
+
+        # float32 values are compared with the values given, rounded to 6
+        # significant digits, a chunk of rows at a time
+        if self.od.dtype != py.float32 or not self.rounded:
+            return
+        rows = py.arange(len(self.od))[rows]
+        for start in xrange(0, len(rows), ROUND_CHUNK):
+            chunk = slice(start, start + ROUND_CHUNK)
+            given = py.asarray(values[chunk], dtype=py.float64)
+            stored = asFloat64(self.od[rows[chunk], :numVals], True)
+            if not py.all((stored == given) | py.isnan(given)):
+                self.rounded = False
+                return
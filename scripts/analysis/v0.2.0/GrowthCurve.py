@@ -4,66 +4,606 @@
 #
 # Author: Daniel A Cuevas
 # Created on 21 Nov. 2013
-# Updated on 15 Jan. 2014
+# Updated on 18 Oct. 2026
 
 
+import itertools
+import multiprocessing
+import warnings
 import pylab as py
+from numpy.random import RandomState
+import CurveStore
+import Kernels
 import Models
 
+# Number of replicate groups fitted together in the lag search
+LAG_CHUNK = 256
 
-class GrowthCurve:
-    '''Bacteria growth curve class'''
-    def __init__(self, data, time):
-        # data format: multidimensional numpy array
+# Number of replicate groups per bootstrap task
+BOOT_CHUNK = 256
+
+# Largest number of replicate groups fitted as one batch
+FIT_CHUNK = 512
+
+# Growth parameters given bootstrap confidence intervals
+CI_PARAMS = ('lag', 'maxGrowthRate', 'asymptote', 'growthLevel')
+
+# Growth parameters kept by GrowthCurveResults, with and without model
+# selection
+RESULT_PARAMS = ('startOD', 'asymptote', 'maxGrowthRate', 'mgrTime', 'lag',
+                 'growthLevel')
+MODEL_RESULTS = ('model', 'modelLag', 'modelShape', 'modelSSE', 'modelAIC',
+                 'modelBIC')
+
+
+def medianCurves(data, mask, rounded=False):
+    '''Median curve of each group of a (groups x replicates x time) array
+
+    Valid replicates must come first in each group as set by mask.
+    Medians are computed in float64 for any float type of data, rounded is
+    passed to CurveStore.asFloat64.
+    '''
+    data = CurveStore.asFloat64(data, rounded)
+
+    # Groups with the same number of replicates are handled together
+    counts = py.sum(mask, axis=1)
+    med = py.empty((len(data), data.shape[-1]))
+    med.fill(py.nan)
+    for n in py.unique(counts):
+        if n == 0:
+            continue
+        sel = counts == n
+        med[sel] = py.median(data[sel, :n], axis=1)
+    return med
+
+
+def chunkSizes(numReps, numTime, maxMemory):
+    '''Return (groups per batch, groups per lag search chunk) so that
+    fitting a batch needs about maxMemory bytes
+
+    The lag search chunk takes at most half of maxMemory and is never
+    larger than LAG_CHUNK. Batches are a multiple of the lag search chunk.
+    Batches are fitted in float64 whatever the float type of the data.
+    '''
+    itemsize = py.dtype(py.float64).itemsize
+
+    # Lag search: about 3 (lags x time) arrays per group, lags at every
+    # half time step
+    lagBytes = 3 * 2 * numTime * numTime * itemsize
+    lagChunk = int(min(max(maxMemory // 2 // lagBytes, 1), LAG_CHUNK))
+
+    # Batch: replicate copies of the median and about 12 curves per group
+    groupBytes = (2 * numReps + 12) * numTime * itemsize
+    batchSize = max((maxMemory - lagChunk * lagBytes) // groupBytes, 1)
+    return int(max(batchSize // lagChunk, 1) * lagChunk), lagChunk
+
+
+def batchParams(batch):
+    '''Return hash of name->values of the growth parameters of a batch
+
+    Holds RESULT_PARAMS, MODEL_RESULTS and the modelSelect, ciLow and
+    ciHigh attributes. Curves are left out, so the hash is small enough to
+    be sent back from a process pool.
+    '''
+    names = RESULT_PARAMS
+    if batch.modelSelect:
+        names += MODEL_RESULTS
+    params = {name: getattr(batch, name) for name in names}
+    params['modelSelect'] = batch.modelSelect
+    params['ciLow'] = batch.ciLow
+    params['ciHigh'] = batch.ciHigh
+    return params
+
+
+def _fitChunk(args):
+    '''Process pool entry point: fit a batch of groups
+
+    args is (data, mask, time, index of each group, asymptote windows,
+    max growth rate windows, bootstrap (resamples, level, seed) or None,
+    batch options). Returns the batchParams hash.
+    '''
+    (data, mask, time, groups, asymWindow, mgrWindow, boot,
+     kwargs) = args
+    batch = GrowthCurveBatch(data, time, mask, asymWindow=asymWindow,
+                             mgrWindow=mgrWindow, **kwargs)
+    if boot:
+        numBoot, level, seed = boot
+        batch.bootstrap(numBoot, level, seed, 1, groups)
+    return batchParams(batch)
+
+
+def iterFits(results, order=None, asymWindow=3, mgrWindow=4,
+             batchSize=None, jobs=1, boot=None, cache=None, **kwargs):
+    '''Fit the groups of a GrowthCurveResults batch by batch
+
+    Groups are fitted in the given order of result rows (all rows by
+    default) with the GrowthCurveBatch options in kwargs, in batches of
+    batchSize groups but at most FIT_CHUNK. With jobs > 1 batches are
+    fitted in a pool of jobs processes. Each batch is stored in results,
+    then the slice of order it covers is yielded, so its output can be
+    written before the next batch is done.
+
+    The fit of a group does not depend on its batch, so results are the
+    same for any order, batchSize and jobs. boot is (resamples, level,
+    seed) to also bootstrap confidence intervals. Groups found in cache, a
+    ResultCache, are loaded instead of fitted and fitted groups are added
+    to it. Batches widen data with the rounded flag of results.
+    '''
+    if order is None:
+        order = py.arange(results.numGroups)
+    kwargs['rounded'] = results.rounded
+    asymWindow = py.zeros(results.numGroups, dtype=int) + asymWindow
+    mgrWindow = py.zeros(results.numGroups, dtype=int) + mgrWindow
+    batchSize = min(batchSize or FIT_CHUNK, FIT_CHUNK)
+    slices = [slice(start, start + batchSize)
+              for start in xrange(0, len(order), batchSize)]
+
+    # Keys hold everything the fit of a group depends on
+    # Bootstrap resamples are seeded by the index of the group
+    cached = py.zeros(len(order), dtype=bool)
+    if cache:
+        options = repr((sorted((k, v) for k, v in kwargs.items()
+                               if k != 'lagChunk'),
+                        boot, str(results.data.dtype)))
+        keys = cache.keys(results.data, results.mask, results.time,
+                          results.dataRows[order], asymWindow[order],
+                          mgrWindow[order], options,
+                          order if boot else None)
+        cached = cache.contains(keys)
+
+    # Batch data is copied only when the batch is handed out
+    todo = [order[s][~cached[s]] for s in slices]
+    args = (results.groupData(rows) +
+            (results.time, rows, asymWindow[rows], mgrWindow[rows], boot,
+             kwargs)
+            for rows in todo if len(rows))
+
+    # Batches are handed out in order and their results collected in the
+    # same order as they finish
+    pool = None
+    numTasks = sum(1 for rows in todo if len(rows))
+    if jobs > 1 and numTasks > 1:
+        pool = multiprocessing.Pool(min(jobs, numTasks))
+        parts = pool.imap(_fitChunk, args)
+    else:
+        parts = itertools.imap(_fitChunk, args)
+    try:
+        for s, rows in itertools.izip(slices, todo):
+            if py.any(cached[s]):
+                results.addBatch(cache.get(keys[s][cached[s]]),
+                                 order[s][cached[s]])
+            if len(rows):
+                params = next(parts)
+                results.addBatch(params, rows)
+                if cache:
+                    cache.put(keys[s][~cached[s]], params)
+            yield s
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+
+def fitGroups(data, time, mask=None, **kwargs):
+    '''Fit all replicate groups and return GrowthCurveResults
+
+    kwargs are the options of iterFits.
+    '''
+    results = GrowthCurveResults(data, time, mask)
+    for s in iterFits(results, **kwargs):
+        pass
+    return results
+
+
+def _bootstrapChunk(args):
+    '''Process pool entry point: bootstrap confidence intervals of a chunk
+    of groups
+
+    args is (data, mask, time, index of each group, resamples, level,
+    seed, asymptote windows, max growth rate windows, batch options).
+    Returns (hash of parameter->low bounds, hash of parameter->high bounds).
+    '''
+    (data, mask, time, groups, numBoot, level, seed, asymWindow,
+     mgrWindow, kwargs) = args
+    numGroups, numReps = mask.shape
+    counts = py.sum(mask, axis=1)
+
+    # Resampled replicate indices (groups x resamples x replicates)
+    # Each group has its own generator seeded by (seed, group index)
+    # Indices are sorted: the median only depends on the resampled set
+    idx = py.zeros((numGroups, numBoot, numReps), dtype=int) - 1
+    for g in xrange(numGroups):
+        n = counts[g]
+        if n:
+            rs = RandomState([seed, groups[g]])
+            idx[g, :, :n] = py.sort(rs.randint(0, n, (numBoot, n)), axis=1)
+
+    # Only distinct (group, resampled set) pairs are fitted
+    # With few replicates most resamples repeat one of a few sets
+    keys = py.column_stack([py.repeat(py.arange(numGroups), numBoot),
+                            idx.reshape(-1, numReps)])
+    rowType = py.dtype((py.void, keys.dtype.itemsize * keys.shape[1]))
+    uniq, first, inverse = py.unique(keys.view(rowType)[:, 0],
+                                     return_index=True, return_inverse=True)
+    group = keys[first, 0]
+    reps = keys[first, 1:]
+    bootMask = reps >= 0
+    bootData = data[group[:, None], py.maximum(reps, 0)]
+    bootData[~bootMask] = py.nan
+    batch = GrowthCurveBatch(bootData, time, bootMask,
+                             asymWindow=asymWindow[group],
+                             mgrWindow=mgrWindow[group], **kwargs)
+
+    # Percentile interval of every parameter over the resamples
+    q = [50 * (1 - level), 50 * (1 + level)]
+    low = {}
+    high = {}
+    for name in CI_PARAMS:
+        values = getattr(batch, name)[inverse].reshape(numGroups, numBoot)
+        bounds = py.percentile(values, q, axis=1)
+
+        # NaN resamples are left out, only for the groups having them
+        bad = py.isnan(values).any(axis=1)
+        if py.any(bad):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                bounds[:, bad] = py.nanpercentile(values[bad], q, axis=1)
+        low[name], high[name] = bounds
+    return low, high
+
+
+class GrowthCurveBatch:
+    '''Bacteria growth curves of many replicate groups
+
+    lagMethod and lagTol select the lag search of Models.Logistic. With
+    fullFit, start OD, asymptote, max growth rate and lag are refined
+    together by least squares from the estimates of the lag search.
+    modelSelect ("aic" or "bic") also fits the Gompertz and Richards
+    models and picks the best of the three models per group.
+    asymWindow and mgrWindow are the sliding window sizes of the asymptote
+    and max growth rate, either one size or one size per group.
+    backend "numba" runs the asymptote, max growth rate, grid lag search
+    and growth level as compiled Kernels, if Numba is installed.
+    lagChunk groups are fitted together in the lag search and model fits.
+
+    The batch is fitted in float64. float32 data is widened with
+    CurveStore.asFloat64. With rounded, data known to have at most 6
+    significant digits, its fit matches the fit of the float64 data.
+    '''
+    def __init__(self, data, time, mask=None, lagMethod='grid', lagTol=0.01,
+                 fullFit=False, modelSelect=None, asymWindow=3, mgrWindow=4,
+                 backend='numpy', lagChunk=LAG_CHUNK, rounded=False):
+        # data format: 3D numpy array (groups x replicates x time)
         #              Each inner array is an array of OD values
         #              ordered by time.
-        #              This is important for determining the median
+        # mask format: 2D boolean array (groups x replicates)
+        #              True for replicates holding data. Valid replicates
+        #              must come first in each group.
+        #              All replicates are valid if no mask is given.
+        self.data = CurveStore.asFloat64(data, rounded)  # OD data values
+        self.time = py.asarray(time, dtype=float)  # time values
+        if mask is None:
+            mask = py.ones(data.shape[:2], dtype=bool)
+        self.mask = mask
+        self.numGroups = len(data)
+        self.lagMethod = lagMethod
+        self.lagTol = lagTol
+        self.fullFit = fullFit
+        self.modelSelect = modelSelect
+        self.asymWindow = py.zeros(self.numGroups, dtype=int) + asymWindow
+        self.mgrWindow = py.zeros(self.numGroups, dtype=int) + mgrWindow
+        if backend == 'numba' and not Kernels.HAVE_NUMBA:
+            backend = 'numpy'
+        self.backend = backend
+        self.lagChunk = lagChunk
+        self.ciLow = None  # Hash of parameter->confidence interval bounds
+        self.ciHigh = None  # set by bootstrap
 
-        self.dataReps = data  # OD data values (replicates implied)
-        self.dataMed = py.median(self.dataReps, axis=0)
-        self.time = time  # time values
+        self.dataMed = self.__calcMedian()
+        self.startOD = self.dataMed[:, 1].copy()
         self.asymptote = self.__calcAsymptote()
         self.maxGrowthRate, self.mgrTime = self.__calcMGR()
         self.dataLogistic, self.lag = self.__calcLag()
+        if fullFit:
+            self.__calcFit()
         self.growthLevel = self.__calcGrowth()
+        if modelSelect:
+            self.__calcModels()
+
+    def __calcMedian(self):
+        '''Obtain the median curve of each group'''
+        return medianCurves(self.data, self.mask)
 
     def __calcAsymptote(self):
         '''Obtain the value of the highest OD reading'''
-        # Calculate asymptote using a sliding window of 3 data points
-        stop = len(self.time) - 3
-        maxA = -1
-        for idx in xrange(1, stop):
-            av = py.mean(self.dataMed[idx:idx + 3])
-            if av > maxA:
-                maxA = av
-        return maxA
+        # Calculate asymptote using a sliding window of asymWindow points
+        # Window sums grow by one data point per window size, so larger
+        # windows reuse the sums of smaller ones
+        # Groups with windows longer than the curve keep -1
+        if self.backend == 'numba':
+            return Kernels.asymptote(self.dataMed, self.asymWindow)
+        numTime = len(self.time)
+        asymptote = py.zeros(self.numGroups) - 1
+        total = py.zeros((self.numGroups, numTime))
+        for w in xrange(1, min(py.amax(self.asymWindow, initial=0),
+                               numTime) + 1):
+            total[:, :numTime - w + 1] += self.dataMed[:, w - 1:]
+            sel = self.asymWindow == w
+            av = total[sel, 1:numTime - w] / w
+            if not py.any(sel) or not av.shape[1]:
+                continue
+
+            # Windows with NaN values are skipped
+            av = py.where(py.isnan(av), -py.inf, av)
+            asymptote[sel] = py.maximum(py.amax(av, axis=1), -1)
+        return asymptote
 
     def __calcMGR(self):
         '''Obtain the value of the max growth'''
-        # Calculate max growth rate using a sliding window of 4 data points
-        stop = len(self.time) - 4
-        maxGR = 0
-        for idx in xrange(1, stop):
+        # Calculate max growth rate using a sliding window of mgrWindow
+        # points, the log OD values are shared by all window sizes
+        if self.backend == 'numba':
+            return Kernels.maxGrowthRate(self.dataMed, self.time,
+                                         self.mgrWindow)
+        maxGR = py.zeros(self.numGroups)
+        t = py.zeros(self.numGroups) + py.nan
+        with py.errstate(divide='ignore', invalid='ignore'):
+            logMed = py.log(self.dataMed)
+        for w in py.unique(self.mgrWindow):
+            stop = len(self.time) - w
+            if stop <= 1:
+                continue
+            sel = py.flatnonzero(self.mgrWindow == w)
 
             # Growth rate calculation:
-            # (log(i+3) - log(i)) / (time(i+3) - time(i))
-            gr = ((py.log(self.dataMed[idx + 3]) - py.log(self.dataMed[idx])) /
-                  (self.time[idx + 3] - self.time[idx]))
-            if idx == 1 or gr > maxGR:
-                maxGR = gr
-                t = self.time[idx + 2]  # Midpoint time value
+            # (log(i+w-1) - log(i)) / (time(i+w-1) - time(i))
+            with py.errstate(divide='ignore', invalid='ignore'):
+                gr = ((logMed[sel, w:stop + w - 1] - logMed[sel, 1:stop]) /
+                      (self.time[w:stop + w - 1] - self.time[1:stop]))
 
+            # The first window wins ties and is kept if its rate is NaN
+            # NaN rates of later windows are skipped
+            best = py.argmax(py.where(py.isnan(gr), -py.inf, gr), axis=1)
+            best[py.isnan(gr[:, 0])] = 0
+            maxGR[sel] = gr[py.arange(len(sel)), best]
+            t[sel] = self.time[best + 1 + w // 2]  # Midpoint time value
         return maxGR, t
 
     def __calcLag(self):
         '''Obtain the value of the lag phase using best fit model'''
-        logisticData, lag, sseF = Models.Models(self.dataMed, self.dataMed[1],
-                                                self.maxGrowthRate,
-                                                self.asymptote,
-                                                self.time).Logistic()
-        return logisticData, lag
+        # Groups with the same median curve and parameters share one lag
+        # search, as happens for groups a parameter sweep leaves unchanged
+        # Rows are compared byte for byte as single void values
+        inputs = py.column_stack([self.dataMed, self.startOD,
+                                  self.maxGrowthRate, self.asymptote])
+        rowType = py.dtype((py.void, inputs.dtype.itemsize * inputs.shape[1]))
+        keys = py.ascontiguousarray(inputs).view(rowType)[:, 0]
+        uniq, first, inverse = py.unique(keys, return_index=True,
+                                         return_inverse=True)
+
+        # Fits are made in order of first appearance
+        order = py.argsort(first)
+        fitOf = py.empty(len(first), dtype=int)
+        fitOf[order] = py.arange(len(first))
+        first = first[order]
+
+        logisticData = py.empty((len(first), len(self.time)))
+        lag = py.empty(len(first))
+        for start in xrange(0, len(first), self.lagChunk):
+            s = slice(start, start + self.lagChunk)
+            g = first[s]
+            logisticData[s], lag[s], sseF = Models.Models(
+                self.dataMed[g], self.startOD[g], self.maxGrowthRate[g],
+                self.asymptote[g], self.time).Logistic(self.lagMethod,
+                                                       self.lagTol,
+                                                       self.backend)
+        return logisticData[fitOf[inverse]], lag[fitOf[inverse]]
+
+    def __calcFit(self):
+        '''Refine all logistic parameters by least squares'''
+        for start in xrange(0, self.numGroups, self.lagChunk):
+            s = slice(start, start + self.lagChunk)
+            (self.dataLogistic[s], (self.startOD[s], self.asymptote[s],
+                                    self.maxGrowthRate[s], self.lag[s]),
+             sseF) = Models.Models(
+                self.dataMed[s], self.startOD[s], self.maxGrowthRate[s],
+                self.asymptote[s], self.time).LogisticFit(self.lag[s])
 
     def __calcGrowth(self):
         '''Calculate growth level using an adjusted harmonic mean'''
-        return len(self.dataLogistic) / py.sum([(1 / (x + self.asymptote))
-                                                for x in self.dataLogistic])
+        if self.backend == 'numba':
+            return Kernels.growthLevel(self.dataLogistic, self.asymptote)
+        return self.dataLogistic.shape[1] / py.sum(
+            1 / (self.dataLogistic + self.asymptote[:, None]), axis=1,
+            dtype=py.float64)
+
+    def __calcModels(self):
+        '''Fit Gompertz and Richards models and select the best model
+
+        Sets model (index into Models.MODELS), modelLag, modelShape
+        (Richards only), dataModel, and modelSSE, modelAIC, modelBIC of
+        the selected model.
+        '''
+        numTime = len(self.time)
+        curves = py.empty((len(Models.MODELS), self.numGroups, numTime))
+        lags = py.empty((len(Models.MODELS), self.numGroups))
+        self.modelShape = py.zeros(self.numGroups) + py.nan
+        curves[0] = self.dataLogistic
+        lags[0] = self.lag
+        for start in xrange(0, self.numGroups, self.lagChunk):
+            s = slice(start, start + self.lagChunk)
+            models = Models.Models(self.dataMed[s], self.startOD[s],
+                                   self.maxGrowthRate[s], self.asymptote[s],
+                                   self.time)
+            curves[1, s], lags[1, s], sseF = models.Gompertz()
+            (curves[2, s], lags[2, s], self.modelShape[s],
+             sseF) = models.Richards()
+
+        # SSE leaves out the last time point as in the lag search
+        sse = py.sum((self.dataMed[:, :-1] - curves[..., :-1]) ** 2, axis=-1,
+                     dtype=py.float64)
+        params = py.array(Models.MODEL_PARAMS)[:, None]
+        aic = Models.criterion(sse, numTime - 1, params, 'aic')
+        bic = Models.criterion(sse, numTime - 1, params, 'bic')
+
+        # The first model wins ties, groups without a finite score keep
+        # the logistic model
+        score = bic if self.modelSelect == 'bic' else aic
+        best = py.argmin(py.where(py.isnan(score), py.inf, score), axis=0)
+        idx = py.arange(self.numGroups)
+        self.model = best
+        self.modelLag = lags[best, idx]
+        self.modelShape[best != 2] = py.nan
+        self.dataModel = curves[best, idx]
+        self.modelSSE = sse[best, idx]
+        self.modelAIC = aic[best, idx]
+        self.modelBIC = bic[best, idx]
+
+    def bootstrap(self, numBoot=1000, level=0.95, seed=0, jobs=1,
+                  groups=None):
+        '''Bootstrap confidence intervals of the growth parameters
+
+        Replicates of every group are resampled numBoot times and fitted
+        with the options of this batch. Sets ciLow and ciHigh, hashes of
+        parameter->bounds of the level percentile interval for the
+        parameters in CI_PARAMS. Resamples of a group only depend on seed
+        and the group index, so results are the same for any jobs.
+        groups is the index of each group of this batch in the run, by
+        default 0 to numGroups - 1, when a run is fitted in several
+        batches.
+        '''
+        if groups is None:
+            groups = py.arange(self.numGroups)
+        kwargs = {'lagMethod': self.lagMethod, 'lagTol': self.lagTol,
+                  'fullFit': self.fullFit, 'backend': self.backend,
+                  'lagChunk': self.lagChunk}
+        args = []
+        for start in xrange(0, self.numGroups, BOOT_CHUNK):
+            s = slice(start, start + BOOT_CHUNK)
+            args.append((self.data[s], self.mask[s], self.time,
+                         groups[s], numBoot, level, seed,
+                         self.asymWindow[s], self.mgrWindow[s], kwargs))
+
+        if jobs > 1 and len(args) > 1:
+            pool = multiprocessing.Pool(min(jobs, len(args)))
+            parts = pool.map(_bootstrapChunk, args)
+            pool.close()
+            pool.join()
+        else:
+            parts = [_bootstrapChunk(a) for a in args]
+
+        self.ciLow = {}
+        self.ciHigh = {}
+        for name in CI_PARAMS:
+            self.ciLow[name] = py.concatenate(
+                [low[name] for low, high in parts] + [py.zeros(0)])
+            self.ciHigh[name] = py.concatenate(
+                [high[name] for low, high in parts] + [py.zeros(0)])
+
+    def getCurve(self, idx):
+        '''Return GrowthCurve view of one group'''
+        return GrowthCurve(self.data[idx][self.mask[idx]], self.time, self,
+                           idx)
+
+
+class GrowthCurve:
+    '''Bacteria growth curve class
+
+    View onto one group of a GrowthCurveBatch. Without a batch, a batch is
+    created for the given replicates alone.
+    '''
+    def __init__(self, data, time, batch=None, index=0):
+        # data format: multidimensional numpy array
+        #              Each inner array is an array of OD values
+        #              ordered by time.
+        #              This is important for determining the median
+        if batch is None:
+            batch = GrowthCurveBatch(py.asarray(data)[None], time)
+
+        self.dataReps = data  # OD data values (replicates implied)
+        self.dataMed = batch.dataMed[index]
+        self.time = time  # time values
+        self.asymptote = batch.asymptote[index]
+        self.maxGrowthRate = batch.maxGrowthRate[index]
+        self.mgrTime = batch.mgrTime[index]
+        self.dataLogistic = batch.dataLogistic[index]
+        self.lag = batch.lag[index]
+        self.growthLevel = batch.growthLevel[index]
+        if batch.modelSelect:
+            self.model = Models.MODELS[batch.model[index]]
+            self.modelLag = batch.modelLag[index]
+            self.modelShape = batch.modelShape[index]
+            self.dataModel = batch.dataModel[index]
+            self.modelSSE = batch.modelSSE[index]
+            self.modelAIC = batch.modelAIC[index]
+            self.modelBIC = batch.modelBIC[index]
+
+
+class GrowthCurveResults:
+    '''Compact results of GrowthCurveBatch fits
+
+    Keeps the growth parameters of every group as arrays. Median and
+    logistic curves are rebuilt on demand from the replicate data and the
+    parameters instead of being stored. A run may be fitted in several
+    batches, each added with addBatch (see iterFits).
+
+    dataRows is the row of data holding the replicates of each group, so
+    groups fitted with other options can share their curves. By default
+    group i is row i of data. rounded is passed to CurveStore.asFloat64.
+    '''
+    def __init__(self, data, time, mask=None, dataRows=None, rounded=False):
+        self.data = data  # OD data values (replicates implied)
+        self.rounded = rounded  # float32 data has at most 6 digits
+        if mask is None:
+            mask = py.ones(data.shape[:2], dtype=bool)
+        self.mask = mask
+        self.time = py.asarray(time, dtype=float)
+        if dataRows is None:
+            dataRows = py.arange(len(data))
+        self.dataRows = dataRows
+        self.numGroups = len(dataRows)
+        self.modelSelect = None
+        self.ciLow = None  # Hash of parameter->confidence interval bounds
+        self.ciHigh = None
+        for name in RESULT_PARAMS + MODEL_RESULTS:
+            setattr(self, name, None)
+
+    def addBatch(self, params, rows):
+        '''Store the batchParams hash of a batch fitted for the groups in
+        rows, an index array or slice'''
+        names = RESULT_PARAMS
+        if params['modelSelect']:
+            self.modelSelect = params['modelSelect']
+            names += MODEL_RESULTS
+        for name in names:
+            values = params[name]
+            if getattr(self, name) is None:
+                setattr(self, name, py.empty(self.numGroups,
+                                             dtype=values.dtype))
+            getattr(self, name)[rows] = values
+
+        if params['ciLow']:
+            if self.ciLow is None:
+                self.ciLow = {n: py.empty(self.numGroups) for n in CI_PARAMS}
+                self.ciHigh = {n: py.empty(self.numGroups)
+                               for n in CI_PARAMS}
+            for name in CI_PARAMS:
+                self.ciLow[name][rows] = params['ciLow'][name]
+                self.ciHigh[name][rows] = params['ciHigh'][name]
+
+    def groupData(self, rows):
+        '''Return (replicate data, mask) of groups in rows'''
+        idx = self.dataRows[rows]
+        return self.data[idx], self.mask[idx]
+
+    def median(self, rows):
+        '''Return median curves of groups in rows'''
+        return medianCurves(*self.groupData(rows), rounded=self.rounded)
+
+    def logistic(self, rows):
+        '''Return logistic curves of groups in rows'''
+        with py.errstate(over='ignore'):
+            return Models.logistic(self.startOD[rows, None],
+                                   self.asymptote[rows, None],
+                                   self.maxGrowthRate[rows, None],
+                                   self.lag[rows, None], self.time)
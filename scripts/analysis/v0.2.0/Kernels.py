@@ -0,0 +1,229 @@
+# Kernels.py
+# Compiled loop kernels of the growth curve calculations
+# Numba is optional: without it the NumPy code in GrowthCurve and Models
+# is used
+#
+# Author: Daniel A Cuevas
+# Created on 18 Oct. 2026
+# Updated on 18 Oct. 2026
+
+import math
+import numpy as np
+
+try:
+    import numba
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+
+def jit(func):
+    '''Compile func with Numba if it is installed
+
+    Compiled code is cached on disk so it is only built on the first run.
+    Float errors give inf/NaN as in NumPy instead of raising.
+    '''
+    if HAVE_NUMBA:
+        return numba.njit(cache=True, error_model='numpy')(func)
+    return func
+
+
+@jit
+def blockSum(x, start, n):
+    '''Sum n <= 128 values of x from start as a NumPy pairwise sum block'''
+    if n < 8:
+        total = 0.
+        for i in range(start, start + n):
+            total += x[i]
+        return total
+    r0 = x[start]
+    r1 = x[start + 1]
+    r2 = x[start + 2]
+    r3 = x[start + 3]
+    r4 = x[start + 4]
+    r5 = x[start + 5]
+    r6 = x[start + 6]
+    r7 = x[start + 7]
+    i = 8
+    while i < n - (n % 8):
+        r0 += x[start + i]
+        r1 += x[start + i + 1]
+        r2 += x[start + i + 2]
+        r3 += x[start + i + 3]
+        r4 += x[start + i + 4]
+        r5 += x[start + i + 5]
+        r6 += x[start + i + 6]
+        r7 += x[start + i + 7]
+        i += 8
+    total = ((r0 + r1) + (r2 + r3)) + ((r4 + r5) + (r6 + r7))
+    while i < n:
+        total += x[start + i]
+        i += 1
+    return total
+
+
+@jit
+def pairwiseSum(x, n):
+    '''Sum the first n values of x in the order NumPy sums them
+
+    NumPy pairwise summation splits the values in halves down to blocks
+    of at most 128, so results are equal to the bit. The halves are
+    walked with an explicit stack: cached recursive kernels crash Numba.
+    '''
+    if n <= 128:
+        return blockSum(x, 0, n)
+
+    # Stack of (start, size, halves done) and of partial sums
+    starts = np.empty(64, dtype=np.int64)
+    sizes = np.empty(64, dtype=np.int64)
+    done = np.empty(64, dtype=np.int64)
+    sums = np.empty(64)
+    starts[0] = 0
+    sizes[0] = n
+    done[0] = 0
+    top = 1
+    numSums = 0
+    while top:
+        start = starts[top - 1]
+        size = sizes[top - 1]
+        if size <= 128:
+            sums[numSums] = blockSum(x, start, size)
+            numSums += 1
+            top -= 1
+            continue
+
+        half = size // 2
+        half -= half % 8
+        if done[top - 1] == 2:
+            # Both halves summed: replace them by their sum
+            sums[numSums - 2] += sums[numSums - 1]
+            numSums -= 1
+            top -= 1
+            continue
+        if done[top - 1] == 0:
+            starts[top] = start
+            sizes[top] = half
+        else:
+            starts[top] = start + half
+            sizes[top] = size - half
+        done[top - 1] += 1
+        done[top] = 0
+        top += 1
+    return sums[0]
+
+
+@jit
+def asymptote(med, windows):
+    '''Highest sliding window mean of each median curve
+
+    As GrowthCurveBatch: windows start at the second reading and leave
+    out the last one, NaN windows are skipped and the result is at least
+    -1.
+    '''
+    numGroups, numTime = med.shape
+    result = np.empty(numGroups)
+    for g in range(numGroups):
+        w = windows[g]
+        best = -np.inf
+        for i in range(1, numTime - w):
+            total = 0.
+            for j in range(w):
+                total += med[g, i + j]
+            av = total / w
+            if av > best:
+                best = av
+        result[g] = max(best, -1.)
+    return result
+
+
+@jit
+def maxGrowthRate(med, time, windows):
+    '''Highest log growth rate of sliding windows of each median curve
+
+    Returns (max growth rates, midpoint times) with the tie and NaN rules
+    of GrowthCurveBatch.
+    '''
+    numGroups, numTime = med.shape
+    maxGR = np.zeros(numGroups)
+    mgrTime = np.empty(numGroups)
+    mgrTime[:] = np.nan
+    for g in range(numGroups):
+        w = windows[g]
+        stop = numTime - w
+        if stop <= 1:
+            continue
+        best = 1
+        bestGR = np.nan
+        for i in range(1, stop):
+            gr = ((math.log(med[g, i + w - 1]) - math.log(med[g, i])) /
+                  (time[i + w - 1] - time[i]))
+            if i == 1:
+                bestGR = gr
+                if np.isnan(gr):
+                    break
+            elif gr > bestGR:
+                best = i
+                bestGR = gr
+        maxGR[g] = bestGR
+        mgrTime[g] = time[best + w // 2]
+    return maxGR, mgrTime
+
+
+@jit
+def logisticGrid(med, startOD, maxgrowth, asymptote, time, lags):
+    '''Logistic lag search over every given lag
+
+    Same model, SSE and choice of lag as Models.Logistic on the grid, but
+    without the (curves x lags x time) array. Returns (logistic curves,
+    lags, SSE).
+    '''
+    numGroups, numTime = med.shape
+    logistic = np.empty((numGroups, numTime))
+    lagF = np.empty(numGroups)
+    sseF = np.empty(numGroups)
+    diff = np.empty(numTime - 1)
+    for g in range(numGroups):
+        s = startOD[g]
+        A = asymptote[g]
+        rate = maxgrowth[g] / A
+        best = 0
+        bestSSE = np.nan
+        for k in range(len(lags)):
+            for i in range(numTime - 1):
+                d = med[g, i] - (s + ((A - s) /
+                                      (1 + math.exp((rate *
+                                                     (lags[k] - time[i])) +
+                                                    2))))
+                diff[i] = d * d
+            sse = pairwiseSum(diff, numTime - 1)
+
+            # The first lag wins ties, NaN SSEs are only kept for the
+            # first lag
+            if k == 0:
+                bestSSE = sse
+                if np.isnan(sse):
+                    break
+            elif sse < bestSSE:
+                best = k
+                bestSSE = sse
+
+        for i in range(numTime):
+            logistic[g, i] = s + ((A - s) /
+                                  (1 + math.exp((rate * (lags[best] -
+                                                         time[i])) + 2)))
+        lagF[g] = lags[best]
+        sseF[g] = bestSSE
+    return logistic, lagF, sseF
+
+
+@jit
+def growthLevel(logistic, asymptote):
+    '''Adjusted harmonic mean of each logistic curve'''
+    numGroups, numTime = logistic.shape
+    result = np.empty(numGroups)
+    inv = np.empty(numTime)
+    for g in range(numGroups):
+        for i in range(numTime):
+            inv[i] = 1 / (logistic[g, i] + asymptote[g])
+        result[g] = numTime / pairwiseSum(inv, numTime)
+    return result
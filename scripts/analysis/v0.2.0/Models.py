@@ -3,13 +3,60 @@
 #
 # Author: Daniel A Cuevas
 # Created on 21 Nov. 2013
-# Updated on 15 Jan. 2014
+# Updated on 18 Oct. 2026
 
 import pylab as py
+import Kernels
+
+
+# Golden ratio step used by the golden-section lag search
+INVPHI = (py.sqrt(5) - 1) / 2
+
+# Number of evenly spaced lags scanned to bracket the golden-section search
+GOLDEN_SCAN = 8
+
+# Candidate shape parameters of the Richards model
+# v = 1 is left out: it is the logistic model, which model selection
+# already compares with one parameter less
+RICHARDS_SHAPES = (0.25, 0.5, 2.0, 4.0)
+
+# Models compared by model selection and their number of parameters
+MODELS = ('logistic', 'gompertz', 'richards')
+MODEL_PARAMS = (4, 4, 5)
+
+
+def criterion(sse, numPoints, numParams, kind='aic'):
+    '''Return AIC or BIC of least-squares fits
+
+    sse and numParams broadcast together, numPoints is the number of data
+    points used in the fits.
+    '''
+    numParams = py.asarray(numParams)
+    with py.errstate(divide='ignore'):
+        fit = numPoints * py.log(py.asarray(sse) / numPoints)
+    if kind == 'bic':
+        return fit + numParams * py.log(numPoints)
+    return fit + 2 * numParams
+
+
+def logistic(startOD, asymptote, maxgrowth, lag, time):
+    '''Logistic model values, parameters broadcast against time
+
+    Every logistic curve of the pipeline is built here, so a curve
+    rebuilt from its parameters equals the fitted one to the bit.
+    '''
+    # y = p2 + (A-p2) / (1 + exp(( (um/A) * (L-t) ) + 2))
+    return startOD + ((asymptote - startOD) /
+                      (1 + py.exp(((maxgrowth / asymptote) *
+                                   (lag - py.asarray(time))) + 2)))
 
 
 class Models:
-    '''Class containing growth curve models using given growth parameters'''
+    '''Class containing growth curve models using given growth parameters
+
+    data and parameters may hold many curves: data is then shaped
+    (curves x time) and parameters are arrays with one value per curve.
+    '''
     def __init__(self, data, startOD, maxgrowth, asymptote, time):
         self.data = data
         self.startOD = startOD
@@ -17,58 +64,276 @@ class Models:
         self.asymptote = asymptote
         self.time = time
 
-    def Logistic(self):
-        '''Create logistic model from data'''
+    def __logistic(self, lags):
+        '''Logistic model for lags shaped (... x lags), returns
+        (... x lags x time)'''
+        return logistic(py.asarray(self.startOD)[..., None, None],
+                        py.asarray(self.asymptote)[..., None, None],
+                        py.asarray(self.maxgrowth)[..., None, None],
+                        lags[..., None], self.time)
+
+    def __gompertz(self, lags):
+        '''Gompertz model for lags shaped (... x lags), returns
+        (... x lags x time)'''
+        # y = p2 + (A-p2) * exp(-exp( ((um*e/(4*A)) * (L-t)) + 1 ))
+        # um/4 is the slope matching the (um/A) rate of the logistic model
+        startOD = py.asarray(self.startOD)[..., None, None]
+        asymptote = py.asarray(self.asymptote)[..., None, None]
+        maxgrowth = py.asarray(self.maxgrowth)[..., None, None]
+        with py.errstate(over='ignore', divide='ignore', invalid='ignore'):
+            return startOD + ((asymptote - startOD) *
+                              py.exp(-py.exp((maxgrowth * py.e /
+                                              (4 * asymptote) *
+                                              (lags[..., None] -
+                                               py.asarray(self.time))) + 1)))
+
+    def __richards(self, lags, shape):
+        '''Richards model for lags shaped (... x lags) and one shape
+        parameter, returns (... x lags x time)'''
+        # y = p2 + (A-p2) * (1 + v*exp(1+v) *
+        #                    exp( (um/(4*A)) * (1+v)^(1+1/v) * (L-t) ))^(-1/v)
+        # v = 1 is the logistic model
+        startOD = py.asarray(self.startOD)[..., None, None]
+        asymptote = py.asarray(self.asymptote)[..., None, None]
+        maxgrowth = py.asarray(self.maxgrowth)[..., None, None]
+        v = float(shape)
+        with py.errstate(over='ignore', divide='ignore', invalid='ignore'):
+            x = ((maxgrowth / (4 * asymptote) * (1 + v) ** (1 + 1 / v)) *
+                 (lags[..., None] - py.asarray(self.time)))
+            x += 1 + v
+            py.exp(x, out=x)
+            x *= v
+            x += 1
+
+            # x^(-1/v) by square roots or squares if v is a power of 2,
+            # which is much faster than a general power
+            k = py.log2(v)
+            if k == int(k):
+                for i in xrange(abs(int(k))):
+                    x = py.sqrt(x, out=x) if k > 0 else py.square(x, out=x)
+                py.reciprocal(x, out=x)
+            else:
+                x **= -1 / v
+            x *= asymptote - startOD
+            x += startOD
+        return x
+
+    def __sse(self, models):
+        '''SSE of (... x lags x time) models, leaving out the last time
+        point'''
+        data = py.asarray(self.data)[..., None, :]
+        return py.sum((data[..., :-1] - models[..., :-1]) ** 2, axis=-1,
+                      dtype=py.float64)
+
+    def __best(self, models):
+        '''Choose best of (... x candidates x time) models by SSE
+
+        The first candidate wins ties, NaN SSEs are only kept for the
+        first candidate. Returns (best models, candidate index, SSE).
+        '''
+        sse = self.__sse(models)
+        best = py.argmin(py.where(py.isnan(sse), py.inf, sse), axis=-1)
+        best = py.where(py.isnan(sse[..., 0]), 0, best)
+        bestData = py.take_along_axis(models, best[..., None, None],
+                                      axis=-2)[..., 0, :]
+        sseF = py.take_along_axis(sse, best[..., None], axis=-1)[..., 0]
+        return bestData, best, sseF
+
+    def __lagGrid(self):
+        '''Return every half time step as candidate lags'''
         tStep = self.time[1] - self.time[0]
+        return py.arange(self.time[0], self.time[-1], tStep / 2)
+
+    def Logistic(self, lagMethod='grid', lagTol=0.01, backend='numpy'):
+        '''Create logistic model from data
+
+        lagMethod "grid" tries every half time step as the lag. "golden"
+        scans a few lags between the first and last time value, then runs
+        a golden-section search around the best one until the lag is
+        bracketed within lagTol. backend "numba" runs the grid search as a
+        compiled kernel of curves shaped (curves x time).
+        '''
+        if lagMethod == 'golden':
+            return self.__goldenLogistic(lagTol)
 
         # Time vector for calculating lag phase
-        timevec = py.arange(self.time[0], self.time[-1], tStep / 2)
+        timevec = self.__lagGrid()
+        if backend == 'numba' and Kernels.HAVE_NUMBA:
+            return Kernels.logisticGrid(
+                py.asarray(self.data, dtype=float),
+                py.asarray(self.startOD, dtype=float),
+                py.asarray(self.maxgrowth, dtype=float),
+                py.asarray(self.asymptote, dtype=float),
+                py.asarray(self.time, dtype=float), timevec)
 
         # Try using to find logistic model with optimal lag phase
-        # y = p2 + (A-p2) / (1 + exp(( (um/A) * (L-t) ) + 2))
-        sse = 0
-        sseF = 0
-
-        # Attempt to use every possible value in the time vector as the lag
+        # Every possible value in the time vector is tried as the lag at
+        # once: models are shaped (lags x time)
         # Choose lag that creates best-fit model
-        for idx, lag in enumerate(timevec):
-            logDataTemp = [self.startOD + ((self.asymptote - self.startOD) /
-                                           (1 + py.exp((((self.maxgrowth /
-                                                          self.asymptote) *
-                                                         (lag - t)) + 2)
-                                                       ))
-                                           ) for t in self.time]
-            sse = py.sum([((self.data[i] - logDataTemp[i]) ** 2)
-                          for i in xrange(len(self.data) - 1)])
-            if idx == 0 or sse < sseF:
-                logisticData = logDataTemp
-                lagF = lag
-                sseF = sse
-
-        return logisticData, lagF, sseF
-
-
-# Gompertz model not available/not used right now
-
-#    def Gompertz(self):
-#        '''Create Gompertz model from data'''
-#        tStep = self.time[1] - self.time[0]
-#        # Only go up to time of inflection point
-#        timevec = arange(time[0], mGrowTime, tStep)
-#
-#        # Try using to find Gompertz model with optimal lag phase
-#        # y = (A-p2) * exp(-exp( ((um*e/A-p2) * (L-t)) + 1 ))
-#        for idx, lag in enumerate(timevec):
-#            gompDataTemp = [((self.asymptote - self.startOD) *
-#                             exp(-exp((self.maxgrowth * e /
-#                                       (self.asymptote - self.startOD) *
-#                                      (lag - t)) + 1)))
-#                           for t in self.time]
-#            sse = sum([(data[i] - gompDataTemp[i]) ** 2
-#                       for i in xrange(len(data) - 1])
-#            if idx == 0 or sse < sseF:
-#                gompertzData = gompDataTemp
-#                lagF = lag
-#                sseF = sse
-#
-#        return (gompertData, lagF, sseF)
+        logisticData, best, sseF = self.__best(self.__logistic(timevec))
+        return logisticData, timevec[best], sseF
+
+    def __goldenLogistic(self, lagTol):
+        '''Logistic model with lag found by golden-section search'''
+        if lagTol <= 0:
+            raise ValueError('Lag tolerance must be positive')
+
+        def sse(lag):
+            return self.__sse(self.__logistic(lag[..., None]))[..., 0]
+
+        # Coarse scan of GOLDEN_SCAN lags brackets the best one, so a
+        # local minimum far from it is not followed
+        scan = py.linspace(self.time[0], self.time[-1], GOLDEN_SCAN)
+        scanSSE = self.__sse(self.__logistic(scan))
+        best = py.argmin(py.where(py.isnan(scanSSE), py.inf, scanSSE),
+                         axis=-1)
+        a = scan[py.maximum(best - 1, 0)]
+        b = scan[py.minimum(best + 1, GOLDEN_SCAN - 1)]
+
+        # Interior points c < d, the bracket shrinks by INVPHI each step
+        c = b - INVPHI * (b - a)
+        d = a + INVPHI * (b - a)
+        sseC = sse(c)
+        sseD = sse(d)
+        width = 2 * (scan[1] - scan[0])
+        numIter = 0
+        if width > lagTol:
+            numIter = int(py.ceil(py.log(lagTol / width) / py.log(INVPHI)))
+        for i in xrange(numIter):
+            # Keep [a, d] if c is better, [c, b] otherwise
+            # Curves with NaN medians have NaN SSEs and keep [c, b]
+            with py.errstate(invalid='ignore'):
+                left = sseC < sseD
+            a = py.where(left, a, c)
+            b = py.where(left, d, b)
+            x = py.where(left, b - INVPHI * (b - a), a + INVPHI * (b - a))
+            sseX = sse(x)
+            c, d = py.where(left, x, d), py.where(left, c, x)
+            sseC, sseD = (py.where(left, sseX, sseD),
+                          py.where(left, sseC, sseX))
+
+        lag = (a + b) / 2
+        logisticData = self.__logistic(lag[..., None])
+        return logisticData[..., 0, :], lag, self.__sse(logisticData)[..., 0]
+
+    def LogisticFit(self, lag, maxIter=50, tol=1e-8):
+        '''Fit startOD, asymptote, max growth rate and lag jointly
+
+        Levenberg-Marquardt on the logistic SSE, run for all curves at
+        once with one 4x4 system per curve and iteration. The model
+        parameters and lag are the starting point. Returns
+        (logistic curves, (startOD, asymptote, maxgrowth, lag), SSE).
+        '''
+        data = py.atleast_2d(self.data)[:, :-1]
+        t = py.asarray(self.time, dtype=float)[:-1]
+        params = py.column_stack([py.ravel(x) + py.zeros(len(data))
+                                  for x in (self.startOD, self.asymptote,
+                                            self.maxgrowth, lag)])
+        damping = py.zeros(len(data)) + 1e-3
+
+        def model(p, t):
+            s, A, mu, L = [x[:, None] for x in p.T]
+            with py.errstate(over='ignore', divide='ignore',
+                             invalid='ignore'):
+                q = 1 / (1 + py.exp((mu / A) * (L - t) + 2))
+            return s + (A - s) * q, q
+
+        def residuals(p):
+            f, q = model(p, t)
+            return data - f, q
+
+        def sse(r):
+            total = py.sum(r ** 2, axis=1)
+            return py.where(py.isfinite(total), total, py.inf)
+
+        def solveEach(JTJ, JTr):
+            # One singular system fails the solve of all curves: solve the
+            # curves one by one, singular ones by least squares
+            step = py.empty_like(JTr)
+            for c in xrange(len(JTJ)):
+                try:
+                    step[c] = py.solve(JTJ[c], JTr[c])
+                except py.linalg.LinAlgError:
+                    step[c] = py.dot(py.pinv(JTJ[c]), JTr[c])
+            return step
+
+        r, q = residuals(params)
+        sseF = sse(r)
+        converged = py.zeros(len(data), dtype=bool)
+        for i in xrange(maxIter):
+            # Jacobian of the model (curves x time x parameters)
+            s, A, mu, L = [x[:, None] for x in params.T]
+            with py.errstate(divide='ignore', invalid='ignore'):
+                dq = (A - s) * q * (1 - q)
+                J = py.dstack([1 - q,
+                               q + dq * mu * (L - t) / A ** 2,
+                               -dq * (L - t) / A,
+                               -dq * mu / A])
+            J[~py.isfinite(J)] = 0
+
+            # Damped normal equations
+            JTJ = py.einsum('cti,ctj->cij', J, J)
+            JTr = py.einsum('cti,ct->ci', J, py.nan_to_num(r))
+            diag = py.einsum('cii->ci', JTJ) + 1e-12
+            JTJ[:, range(4), range(4)] += damping[:, None] * diag
+            try:
+                step = py.solve(JTJ, JTr[..., None])[..., 0]
+            except py.linalg.LinAlgError:
+                step = solveEach(JTJ, JTr)
+
+            # Keep steps that lower the SSE and adjust damping per curve
+            # Converged curves are left as they are, so the fit of a curve
+            # does not depend on the other curves fitted with it
+            newParams = params + step
+            newR, newQ = residuals(newParams)
+            newSSE = sse(newR)
+            better = (newSSE < sseF) & ~converged
+            with py.errstate(invalid='ignore'):
+                gain = py.where(better, sseF - newSSE, 0)
+            params[better] = newParams[better]
+            r[better] = newR[better]
+            q[better] = newQ[better]
+            sseF = py.where(better, newSSE, sseF)
+            damping = py.where(better, damping / 10, damping * 10)
+
+            # Converged: SSE gain below tol or no step accepted anymore
+            converged |= (better & (gain <= tol * sseF)) | (damping > 1e10)
+            if py.all(converged):
+                break
+
+        s, A, mu, L = [x[:, None] for x in params.T]
+        with py.errstate(over='ignore', divide='ignore', invalid='ignore'):
+            logisticData = logistic(s, A, mu, L, self.time)
+        return logisticData, tuple(params.T), sseF
+
+    def Gompertz(self):
+        '''Create Gompertz model from data, lag tried at every half time
+        step'''
+        timevec = self.__lagGrid()
+        gompertzData, best, sseF = self.__best(self.__gompertz(timevec))
+        return gompertzData, timevec[best], sseF
+
+    def Richards(self, shapes=RICHARDS_SHAPES):
+        '''Create Richards model from data
+
+        Lag is tried at every half time step for each shape parameter.
+        Returns (model, lag, shape, SSE).
+        '''
+        timevec = self.__lagGrid()
+        richardsData = lag = shape = sseF = None
+        for v in shapes:
+            data, best, sse = self.__best(self.__richards(timevec, v))
+            if sseF is None:
+                richardsData, lag, sseF = data, timevec[best], sse
+                shape = py.zeros_like(sse) + v
+                continue
+
+            # The first shape wins ties, NaN SSEs are only kept for the
+            # first shape
+            with py.errstate(invalid='ignore'):
+                better = sse < sseF
+            richardsData = py.where(better[..., None], data, richardsData)
+            lag = py.where(better, timevec[best], lag)
+            shape = py.where(better, v, shape)
+            sseF = py.where(better, sse, sseF)
+        return richardsData, lag, shape, sseF
@@ -0,0 +1,74 @@
+# PMCache.py
+# On-disk cache of parsed phenotype microarray files
+#
+# Author: Daniel A Cuevas
+# Created on 18 Oct. 2026
+# Updated on 18 Oct. 2026
+
+import hashlib
+import json
+import os
+import sys
+import pylab as py
+
+
+def cachePaths(filepath):
+    '''Return (JSON header, OD matrix) cache paths for a PM file'''
+    return filepath + '.pmcache.json', filepath + '.pmcache.npy'
+
+
+def fileHash(filepath):
+    '''Return content hash of a PM file'''
+    sha1 = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), ''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def load(filepath, digest, version):
+    '''Load cached data for a PM file
+
+    Returns (header text, time values, OD matrix) or None when no cache
+    exists or it was written for different file contents or parser version.
+    The OD matrix is memory-mapped and shaped (columns x timepoints).
+    '''
+    jsonPath, odPath = cachePaths(filepath)
+    try:
+        with open(jsonPath, 'r') as f:
+            info = json.load(f)
+        if info['sha1'] != digest or info['version'] != version:
+            return None
+        od = py.load(odPath, mmap_mode='r')
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+    if list(od.shape) != info['shape']:
+        return None
+    return info['header'].encode('latin-1'), info['time'], od
+
+
+def save(filepath, digest, version, header, time, od):
+    '''Write parsed data of a PM file to its cache
+
+    The old JSON header is removed first and the new one written last, so
+    a cache interrupted while writing is never seen as valid.
+    '''
+    jsonPath, odPath = cachePaths(filepath)
+    info = {'sha1': digest,
+            'version': version,
+            'header': header.decode('latin-1'),
+            'time': time,
+            'shape': list(od.shape)}
+    try:
+        if os.path.exists(jsonPath):
+            os.remove(jsonPath)
+        with open(odPath + '.tmp', 'wb') as f:
+            py.save(f, py.ascontiguousarray(od))
+        os.rename(odPath + '.tmp', odPath)
+        with open(jsonPath + '.tmp', 'w') as f:
+            json.dump(info, f)
+        os.rename(jsonPath + '.tmp', jsonPath)
+    except (IOError, OSError) as e:
+        print >> sys.stderr, 'Could not write cache for {}: {}'.format(
+            filepath, e)
@@ -3,19 +3,236 @@
 #
 # Author: Daniel A Cuevas
 # Created on 12 Dec. 2013
-# Updated on 05 Mar. 2014
+# Updated on 18 Oct. 2026
 
 import pylab as py
-import sys
+import multiprocessing
+import operator
+import os
+import CurveStore
+import PMCache
+import PlateReader
+
+# Bump when parsing changes so that cached files are parsed again
+PARSER_VERSION = 1
+
+# Layout of PMData.columnIndex: one record per data column
+# clone, source and condition are codes into the CurveStore name lists
+COLUMN_INDEX_DTYPE = [('clone', int), ('rep', int), ('source', int),
+                      ('condition', int), ('row', int)]
+
+
+def listFiles(filepath):
+    '''Return PM file paths from a file path, directory or list of them'''
+    if isinstance(filepath, basestring):
+        filepath = [filepath]
+
+    paths = []
+    for path in filepath:
+        if not os.path.isdir(path):
+            paths.append(path)
+            continue
+
+        # Use every file in the directory except hidden and cache files
+        for name in sorted(os.listdir(path)):
+            fullpath = os.path.join(path, name)
+            if name.startswith('.') or '.pmcache.' in name or\
+                    not os.path.isfile(fullpath):
+                continue
+            paths.append(fullpath)
+    return paths
+
+
+def selectColumns(header, select):
+    '''Return indices of data columns matching a selection
+
+    select is (clones, sources, conditions); each is a collection of names
+    to keep or empty/None to keep all.
+    '''
+    clones, sources, conditions = select
+    return [idx for idx in xrange(len(header[0]) - 1)
+            if (not clones or header[0][idx + 1] in clones) and
+            (not sources or header[1][idx + 1] in sources) and
+            (not conditions or header[2][idx + 1] in conditions)]
+
+
+def _subsetHeader(header, cols):
+    '''Return header lines reduced to the given data columns'''
+    return [ll[:1] + [ll[c + 1] for c in cols] for ll in header]
+
+
+def parseFile(filepath, useCache=True, select=None):
+    '''Parse a single PM file
+
+    Returns (header, time, od, lengths): the 4 header lines split on tabs,
+    the time values, the (columns x timepoints) OD matrix and the number
+    of readings found for each column. With a select tuple (see
+    selectColumns) only the matching columns are loaded.
+    '''
+    # Load parsed data from the cache if the file is unchanged
+    cached = None
+    if useCache:
+        digest = PMCache.fileHash(filepath)
+        cached = PMCache.load(filepath, digest, PARSER_VERSION)
+    if cached:
+        header, time, od = cached
+        header = [l.rstrip('\r').split('\t') for l in header.split('\n')]
+        if select:
+            cols = selectColumns(header, select)
+            header = _subsetHeader(header, cols)
+            od = od[cols]
+        return header, time, od, py.repeat(len(time), len(od))
+
+    if select:
+        return _parseSelected(filepath, select)
+
+    f = open(filepath, 'r')
+    text = f.read()
+    f.close()
+
+    # Split off the 4 header lines, the remainder is the OD block
+    # Copies of the file text are released as soon as they are split
+    lines = text.split('\n', 4)
+    del text
+    header = [l.rstrip('\r').split('\t') for l in lines[:4]]
+    headerText = '\n'.join(lines[:4])
+    block = lines[4].rstrip('\r\n') if len(lines) > 4 else ''
+    del lines
+    numCols = len(header[0]) - 1
+
+    # Line 5+: OD values
+    # Fall back to line parsing if the block is not a regular matrix
+    time, od = _parseODBlock(block, numCols)
+    if od is None:
+        return (header,) + _parseODLines(block, numCols)
+
+    if useCache:
+        PMCache.save(filepath, digest, PARSER_VERSION, headerText, time, od)
+    return header, time, od, py.repeat(len(time), len(od))
+
+
+def _parseSelected(filepath, select):
+    '''Parse only the selected columns of a PM file
+
+    The file is streamed line by line and only the selected OD values are
+    converted, so memory and conversion time follow the selection size.
+    '''
+    f = open(filepath, 'r')
+    header = [f.readline().rstrip('\r\n').split('\t') for i in xrange(4)]
+    cols = selectColumns(header, select)
+    header = _subsetHeader(header, cols)
+
+    # Fields to pick from each line: time value then selected OD values
+    # With no selected column the getter must still return a tuple, so an
+    # empty selection gives an empty matrix as it does from the cache
+    fields = [0] + [c + 1 for c in cols]
+    getter = operator.itemgetter(*fields)
+    if len(fields) == 1:
+        getter = lambda ll: (ll[0],)
+    time = []
+    rows = []
+    lineLens = []
+    for l in f:
+        ll = l.rstrip('\r\n').split('\t')
+        if ll == ['']:
+            continue
+        lineLens.append(len(ll))
+
+        # Short line: missing readings stay 0 like the line parser
+        if len(ll) > fields[-1]:
+            vals = getter(ll)
+        else:
+            vals = [ll[i] if i < len(ll) else '0' for i in fields]
+        time.append(float(vals[0]))
+        rows.append(vals[1:])
+    f.close()
+
+    od = py.array(rows, dtype=float).reshape(len(time), len(cols)).T
+    lengths = py.sum(py.array(fields[1:])[None, :] <
+                     py.array(lineLens, dtype=int)[:, None], axis=0)
+    return header, time, py.ascontiguousarray(od), lengths
+
+
+def _runParser(args):
+    '''Process pool entry point: args is (parser, parser arguments...)'''
+    return args[0](*args[1:])
+
+
+def _parseODBlock(block, numCols):
+    '''Bulk OD data block parsing method
+
+    Converts all OD lines in one call and returns the time values and the
+    (columns x timepoints) OD matrix. Returns (None, None) if the block is
+    not a complete matrix of numbers.
+    '''
+    numTime = block.count('\n') + 1 if block else 0
+    if not numTime or block.count('\t') != numTime * numCols:
+        return None, None
+
+    values = py.fromstring(block, sep='\t')
+    if values.size != numTime * (numCols + 1):
+        return None, None
+    values = values.reshape(numTime, numCols + 1)
+    return values[:, 0].tolist(), values[:, 1:].T
+
+
+def _parseODLines(block, numCols):
+    '''OD data lines parsing method
+
+    Returns the time values, the (columns x timepoints) OD matrix and the
+    number of readings found for each column.
+    '''
+    lines = block.splitlines()
+    time = []
+    od = py.zeros((numCols, len(lines)))
+    lengths = py.zeros(numCols, dtype=int)
+    for tIdx, l in enumerate(lines):
+        ll = [float(x) for x in l.split('\t')]
+
+        # Add the current time and its OD readings
+        time.append(ll[0])
+        od[:len(ll) - 1, tIdx] = ll[1:]
+        lengths[:len(ll) - 1] += 1
+    return time, od, lengths
 
 
 class PMData:
-    '''Class for parsing phenotype microarray data'''
-    def __init__(self, filepath):
+    '''Class for parsing phenotype microarray data
+
+    filepath is a PM file, a directory of PM files or a list of either.
+    Multiple files are parsed in a pool of jobs processes and merged; all
+    files must share the same time values.
+
+    If rawFormat is given the files are raw plate reader exports in one of
+    the PlateReader.FORMATS, each holding one plate of one sample. Main
+    sources and substrates are taken from the plate file at platePath.
+    With reps set, file names are <Sample Name>_<Replicate>_<text>.
+
+    clones, sources and conditions restrict loading to the matching
+    columns. The header is always read in full but only matching OD
+    values are converted and stored.
+
+    OD values are stored as dtype, float32 halves the memory of the data.
+    '''
+    def __init__(self, filepath, useCache=True, jobs=1, rawFormat=None,
+                 platePath=None, reps=False, clones=None, sources=None,
+                 conditions=None, dtype=float):
         self.filepath = filepath
+        self.filepaths = listFiles(filepath)  # Array of parsed PM files
+        self.useCache = useCache  # Read/write parsed data cache
+        self.jobs = jobs  # Number of processes used for parsing
+        self.rawFormat = rawFormat  # Raw plate reader export format
+        self.platePath = platePath  # Plate file for raw exports
+        self.reps = reps  # Raw export file names include replicate
+        self.dtype = dtype  # Float type of stored OD values
+        self.select = None  # (clones, sources, conditions) to load
+        if clones or sources or conditions:
+            self.select = (set(clones or []), set(sources or []),
+                           set(conditions or []))
         self.numClones = 0
         self.numConditions = 0
         self.numFiltered = 0
+        self.qaProblems = []  # Array of QA check problem records
         self.numReplicates = {}  # Hash of clone->{rep. count}
         self.clones = []  # Set of unique clone names
         self.conditions = {}  # Hash of source->[conditions]
@@ -27,17 +244,83 @@ class PMData:
         self.conditionsNU = []  # Array of conditions (non-unique)
 
         # Primary data structure to access data
-        self.dataHash = {}  # clone->{rep #}|->{source}->{condition}->[ODs]
-                            #                                      |->{filter}
+        self.store = None  # CurveStore: curves x timepoints OD matrix
+        self.columnIndex = py.zeros(0, dtype=COLUMN_INDEX_DTYPE)
+
+        # Replicate groups: one per clone+source+condition
+        self.groups = []  # Array of (clone, source, condition)
+        self.__groupLookup = {}  # Hash of (clone, source, condition)->group
+        self.__groupRows = py.zeros(0, dtype=int)  # Store rows by group
+        self.__groupOf = py.zeros(0, dtype=int)  # Group of each sorted row
+        self.__groupOffsets = py.zeros(1, dtype=int)  # Group starts/ends
+
         self.__beginParse()
+        self.__buildGroups()
 
     def __beginParse(self):
-        '''Initiate parsing on the given PM file'''
-        f = open(self.filepath, 'r')
-        # Begin iteration through file
-        for lnum, l in enumerate(f):
-            l = l.rstrip('\n')
-            ll = l.split('\t')
+        '''Initiate parsing on the given PM files'''
+        if self.rawFormat:
+            args = [(PlateReader.parseFile, path, self.rawFormat, self.reps)
+                    for path in self.filepaths]
+        else:
+            args = [(parseFile, path, self.useCache, self.select)
+                    for path in self.filepaths]
+
+        if self.jobs > 1 and len(args) > 1:
+            pool = multiprocessing.Pool(min(self.jobs, len(args)))
+            tables = pool.map(_runParser, args)
+            pool.close()
+            pool.join()
+        else:
+            tables = [_runParser(a) for a in args]
+
+        # Raw exports are aligned on time values into a single table
+        if self.rawFormat:
+            plate = {}
+            if self.platePath:
+                plate = PlateReader.readPlate(self.platePath)
+            header, time, od, lengths = PlateReader.buildTable(tables, plate)
+            if self.select:
+                cols = selectColumns(header, self.select)
+                header = _subsetHeader(header, cols)
+                od = od[cols]
+                lengths = lengths[cols]
+            tables = [(header, time, od, lengths)]
+
+        # Merge files: header columns and OD rows are concatenated
+        header = [[''] for i in xrange(4)]
+        for path, (h, time, od, lengths) in zip(self.filepaths, tables):
+            if len(time) != len(tables[0][1]) or\
+                    not py.allclose(time, tables[0][1]):
+                raise ValueError('Time values of {} do not match {}'.format(
+                    path, self.filepaths[0]))
+            for lnum, ll in enumerate(h[:4]):
+                header[lnum][0] = header[lnum][0] or ll[0]
+                header[lnum].extend(ll[1:])
+
+        if len(tables) == 1:
+            time, od, lengths = tables[0][1:]
+        else:
+            time = tables[0][1]
+            od = py.concatenate([t[2] for t in tables])
+            lengths = py.concatenate([t[3] for t in tables])
+
+        self.__parseHeader(header, len(time))
+        self.time = list(time)
+        rows = self.columnIndex['row']
+        self.store.setBlock(rows, od[:len(rows)], lengths[:len(rows)])
+
+        # Check each growth curve is the same length
+        self.__QACheck()
+
+    def __parseHeader(self, header, numTime):
+        '''Header lines parsing method'''
+        # Preallocate one row per data column and one column per timepoint
+        self.store = CurveStore.CurveStore(len(header[0]) - 1, numTime,
+                                           self.dtype)
+
+        # Begin iteration through header lines
+        for lnum, ll in enumerate(header):
 
             # Line 1: clone names
             if lnum == 0:
@@ -55,14 +338,6 @@ class PMData:
             elif lnum == 3:
                 self.__parseWells(ll)
 
-            # Line 5+: OD values
-            else:
-                self.__parseOD(ll)
-        f.close()
-
-        # Check each growth curve is the same length
-        self.__QACheck()
-
     def __parseClones(self, ll):
         '''Clone line parsing method'''
         # All non-unique clones (order preserved)
@@ -95,41 +370,27 @@ class PMData:
             self.conditions[source] = set(self.conditions[source])
             self.numConditions += len(self.conditions[source])
 
-        # Initialize main data hash
-        prevClone = ""
-        prevCond = ""
-        numRep = 1
-        if self.numClones == 1:
-            totalReps = len(self.conditionsNU) / self.numConditions
-
+        # Build column index and register curves in the store
+        # Replicates are numbered by occurrence of each
+        # clone+source+condition in file order
+        self.columnIndex = py.zeros(len(self.clonesNU),
+                                    dtype=COLUMN_INDEX_DTYPE)
+        repCounts = {}
         for idx, clone in enumerate(self.clonesNU):
-            currCond = self.conditionsNU[idx]
-            # Keep track of replicate numbers
-            # Reset rep number if we reach a new clone name
-            if self.numClones == 1:
-                numRep = (idx % totalReps) + 1
-
-            else:
-                numRep = numRep + 1 if (clone == prevClone and
-                                        currCond == prevCond) else 1
+            source = self.sourcesNU[idx]
+            cond = self.conditionsNU[idx]
+            numRep = repCounts.get((clone, source, cond), 0) + 1
+            repCounts[(clone, source, cond)] = numRep
 
             # Update replicate count for clone
-            self.numReplicates[clone] = numRep
-            prevClone = clone
-            prevCond = currCond
+            self.numReplicates[clone] = max(numRep,
+                                            self.numReplicates.get(clone, 0))
 
-            if clone not in self.dataHash:
-                self.dataHash[clone] = {}
-
-            if numRep not in self.dataHash[clone]:
-                self.dataHash[clone][numRep] = {}
-
-            # Add condition to main data hash
-            # Pre-set filter to False
-            for source, sourceList in self.conditions.items():
-                self.dataHash[clone][numRep][source] =\
-                    {cond: {'filter': False, 'od': py.array([])}
-                     for cond in sourceList}
+            # Register curve in the store (filter is pre-set to False)
+            row = self.store.addCurve(clone, numRep, source, cond)
+            self.columnIndex[idx] = (self.store.clone[row], numRep,
+                                     self.store.source[row],
+                                     self.store.condition[row], row)
 
     def __parseWells(self, ll):
         '''Well line parsing method'''
@@ -144,120 +405,202 @@ class PMData:
                 self.wells[source] = {}
             self.wells[source][cond] = well
 
-    def __parseOD(self, ll):
-        '''OD data lines parsing method'''
-        ll = [float(x) for x in ll]
-
-        # Add the current time
-        self.time.append(ll[0])
-        numRep = 1
-        prevClone = ""
-        prevCond = ""
-        if self.numClones == 1:
-            totalReps = len(self.conditionsNU) / self.numConditions
-
-        for idx, od in enumerate(ll[1:]):
-            clone = self.clonesNU[idx]
-            source = self.sourcesNU[idx]
-            condition = self.conditionsNU[idx]
-
-            # Check which clone + replicate we are observing
-            if self.numClones == 1:
-                numRep = (idx % totalReps) + 1
-
-            else:
-                numRep = numRep + 1 if (clone == prevClone and
-                                        condition == prevCond) else 1
-            prevClone = clone
-            prevCond = condition
-
-            # Append OD reading to array
-            self.dataHash[clone][numRep][source][condition]['od'] =\
-                py.append(self.dataHash[clone][numRep][source]
-                          [condition]['od'], od)
-
     def __QACheck(self):
-        '''QA check to ensure stable data set'''
-        problems = []
+        '''QA check to ensure stable data set
+
+        Fills qaProblems with (clone, rep, source, condition, problem, count)
+        records. Problems are "length" (count is the number of readings),
+        "nan" and "nonpositive" (count of such readings) and "time" (count
+        of non-increasing time steps, curve fields are empty).
+        '''
+        n = self.store.numCurves
         numTime = len(self.time)
-        for clone, repDict in self.dataHash.items():
-            for rep, sourceDict in repDict.items():
-                for source, condDict in sourceDict.items():
-                    for cond, odDict in condDict.items():
-
-                        # Find number of values in growth curve
-                        numVals = len(odDict['od'])
-                        if numVals != numTime:
-                            problems.append([clone, rep, source, cond,
-                                             'time:{}\tcurve:{}'.format(
-                                                 numTime, numVals)])
-
-        # Print out issues
-        for p in problems:
-            print >> sys.stderr, '\t'.join([str(x) for x in p])
+        od = self.store.od[:n, :numTime]
+        lengths = self.store.length[:n]
+        stored = py.arange(numTime)[None, :] < lengths[:, None]
+
+        numNaN = py.sum(py.isnan(od) & stored, axis=1)
+        with py.errstate(invalid='ignore'):
+            numNonPos = py.sum((od <= 0) & stored, axis=1)
+
+        # Each check is (problem, curves failing, count per curve)
+        checks = [('length', lengths != numTime, lengths),
+                  ('nan', numNaN > 0, numNaN),
+                  ('nonpositive', numNonPos > 0, numNonPos)]
+
+        self.qaProblems = []
+        for problem, bad, counts in checks:
+            for row in py.flatnonzero(bad):
+                self.qaProblems.append(self.store.getKey(row) +
+                                       (problem, int(counts[row])))
+
+        # Time values must be strictly increasing
+        numSteps = int(py.sum(py.diff(self.time) <= 0))
+        if numSteps:
+            self.qaProblems.append(('', '', '', '', 'time', numSteps))
+
+    def __buildGroups(self):
+        '''Index store rows by clone+source+condition replicate group'''
+        st = self.store
+        n = st.numCurves
+        key = ((st.clone[:n] * len(st.sourceNames) + st.source[:n]) *
+               len(st.conditionNames) + st.condition[:n])
+        uniq, first, inverse = py.unique(key, return_index=True,
+                                         return_inverse=True)
+
+        # Number groups in order of first appearance in the file
+        numGroups = len(uniq)
+        rank = py.empty(numGroups, dtype=int)
+        rank[py.argsort(first)] = py.arange(numGroups)
+        groupOf = rank[inverse]
+
+        # Stable sort keeps replicates of a group in replicate order
+        self.__groupRows = py.argsort(groupOf, kind='mergesort')
+        self.__groupOf = groupOf[self.__groupRows]
+        self.__groupOffsets = py.zeros(numGroups + 1, dtype=int)
+        self.__groupOffsets[1:] = py.cumsum(py.bincount(groupOf,
+                                                        minlength=numGroups))
+
+        self.groups = []
+        for row in py.sort(first):
+            clone, rep, source, cond = st.getKey(row)
+            self.groups.append((clone, source, cond))
+        self.__groupLookup = {g: idx for idx, g in enumerate(self.groups)}
+
+    def __rowsToCurves(self, rows):
+        '''Return OD matrix of store rows, as a view if rows are adjacent'''
+        numTime = len(self.time)
+        if len(rows) and py.all(py.diff(rows) == 1):
+            return self.store.od[rows[0]:rows[-1] + 1, :numTime]
+        return self.store.od[rows, :numTime]
 
     def getCloneReplicates(self, clone, source, condition, applyFilter=False):
         '''Retrieve all growth curves for a clone+source+condition'''
-        # Check if any other replicates should be returned
-        # retArray is a 2xN multidimensional numpy array
-        retArray = py.array([])
-        first = True
-        for i in xrange(1, self.numReplicates[clone] + 1):
-            # Get replicate
-            filterMe = self.dataHash[clone][i][source][condition]['filter']
-            currCurve = self.dataHash[clone][i][source][condition]['od']
-
-            # Check if filter is enabled and curve should be filtered
-            if applyFilter and filterMe:
-                continue
-
-            # Create multidimensional array if first
-            elif first:
-                retArray = py.array([currCurve])
-                first = False
-
-            # Append to multidimensional array if not first
-            else:
-                retArray = py.concatenate((retArray,
-                                           py.array([currCurve])))
-
-        return retArray
-
-    def getFiltered(self):
+        # Return value is a 2xN multidimensional numpy array
+        g = self.__groupLookup.get((clone, source, condition))
+        if g is None:
+            return py.array([])
+        rows = self.__groupRows[self.__groupOffsets[g]:
+                                self.__groupOffsets[g + 1]]
+
+        # Check if filter is enabled and curves should be filtered
+        if applyFilter:
+            rows = rows[~self.store.filter[rows]]
+
+        if not len(rows):
+            return py.array([])
+        return self.__rowsToCurves(rows)
+
+    def getReplicateGroups(self, applyFilter=False, flags=None):
+        '''Retrieve growth curves of all replicate groups at once
+
+        Returns (groups, offsets, curves). Replicates of group i are
+        curves[offsets[i]:offsets[i + 1]], groups[i] is its
+        (clone, source, condition). curves is a view into the store when
+        no curve has to be removed or reordered. flags are filter flags
+        (see filterFlags) used instead of the stored ones.
+        '''
+        rows = self.__groupRows
+        offsets = self.__groupOffsets
+        if flags is None:
+            flags = self.store.filter
+
+        # Check if filter is enabled and curves should be filtered
+        if applyFilter:
+            keep = ~flags[rows]
+            rows = rows[keep]
+            offsets = py.zeros(len(self.groups) + 1, dtype=int)
+            offsets[1:] = py.cumsum(py.bincount(self.__groupOf[keep],
+                                                minlength=len(self.groups)))
+
+        return self.groups, offsets, self.__rowsToCurves(rows)
+
+    def getReplicateTensor(self, applyFilter=False, flags=None):
+        '''Retrieve all replicate groups as a 3D array
+
+        Returns (groups, curves, mask) where curves is shaped
+        (groups x max replicates x timepoints). Missing replicates are NaN
+        and False in the (groups x max replicates) mask.
+        '''
+        groups, offsets, curves = self.getReplicateGroups(applyFilter, flags)
+        counts = py.diff(offsets)
+        maxReps = counts.max() if len(counts) else 0
+
+        # Position of every curve within its group
+        groupOf = py.repeat(py.arange(len(groups)), counts)
+        pos = py.arange(len(curves)) - offsets[groupOf]
+
+        tensor = py.empty((len(groups), maxReps, len(self.time)),
+                          dtype=self.store.od.dtype)
+        tensor.fill(py.nan)
+        tensor[groupOf, pos] = curves
+        mask = py.zeros((len(groups), maxReps), dtype=bool)
+        mask[groupOf, pos] = True
+        return groups, tensor, mask
+
+    def iterCurves(self):
+        '''Iterate over (clone, rep, source, condition, [OD values])'''
+        for row in xrange(self.store.numCurves):
+            clone, rep, source, cond = self.store.getKey(row)
+            yield clone, rep, source, cond, self.store.getCurve(row)
+
+    def getFiltered(self, flags=None):
         '''Retrieve array of all growth curves labeled as filtered'''
         # Create array of tuples for each replicate curve labeled as filtered
         # Format: [(clone, main source, growth condition,
         #           replicate #, [OD values]), (next...), ...]
         ret = []
 
-        # Iterate through clones
-        for clone, repDict in self.dataHash.items():
-
-            # Iterate through replicates
+        if flags is None:
+            flags = self.store.filter
+
+        # Curves are listed in the order of the clone->{rep #}->{source}->
+        # {condition} hashes that held them before the curve store
+        order = {}
+        for clone in self.store.cloneNames:
+            order[clone] = {}
+            for rep in xrange(1, self.numReplicates.get(clone, 0) + 1):
+                order[clone][rep] = {s: {cond: None for cond in condList}
+                                     for s, condList in
+                                     self.conditions.items()}
+
+        # Iterate through curves with filter set to True
+        for clone, repDict in order.items():
             for rep, sourceDict in repDict.items():
-
-                # Iterate through main sources
                 for source, condDict in sourceDict.items():
-
-                    # Iterate through growth conditions
-                    for cond, odDict in condDict.items():
-
-                        # Check if filter is set to True
-                        if odDict['filter']:
+                    for cond in condDict:
+                        row = self.store.getRow(clone, rep, source, cond)
+                        if row is not None and flags[row]:
                             ret.append((clone, source, cond, rep,
-                                        odDict['od']))
+                                        self.store.getCurve(row)))
 
         return ret
 
     def setFilter(self, clone, rep, source, condition, filter):
         '''Set filter for specific curve'''
-        oldFilter = self.dataHash[clone][rep][source][condition]['filter']
-        self.dataHash[clone][rep][source][condition]['filter'] = filter
-
-        # If filter changed from False to True, increment number of filtered
-        if not oldFilter and filter:
-            self.numFiltered += 1
-
-        # If filter changed from True to False, decrement number of filtered
-        elif oldFilter and not filter:
-            self.numFiltered -= 1
+        row = self.store.getRow(clone, rep, source, condition)
+        if row is None:
+            raise KeyError((clone, rep, source, condition))
+        self.store.filter[row] = filter
+        self.numFiltered = int(py.count_nonzero(self.store.filter))
+
+    def filterFlags(self, odMax=0.18, start=1, stop=5):
+        '''Return filter flags of filterCurves without setting them
+
+        Flags are a boolean array with one entry per store row.
+        '''
+        n = self.store.numCurves
+        early = CurveStore.asFloat64(self.store.od[:n, start:stop],
+                                     self.store.rounded)
+        flags = self.store.filter.copy()
+        flags[:n] |= py.any(early >= odMax, axis=1)
+        return flags
+
+    def filterCurves(self, odMax=0.18, start=1, stop=5):
+        '''Filter all curves with an early OD reading at or above odMax
+
+        By default readings 1-4 are checked (30 minute to 2 hour mark).
+        Curves already filtered stay filtered.
+        '''
+        self.store.filter = self.filterFlags(odMax, start, stop)
+        self.numFiltered = int(py.count_nonzero(self.store.filter))
@@ -0,0 +1,185 @@
+# PlateReader.py
+# Readers for raw plate reader kinetic exports
+# Python replacement for misc/pmParser.pl feeding PMData directly
+#
+# Author: Daniel A Cuevas
+# Created on 18 Oct. 2026
+# Updated on 18 Oct. 2026
+
+import datetime
+import os
+import re
+import pylab as py
+
+
+# Time stamp formats tried in order when reading a kinetic read header
+TIME_FORMATS = ['%m/%d/%Y %I:%M:%S %p', '%m/%d/%y %I:%M:%S %p',
+                '%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S']
+
+# Regular expressions for sample names in file names
+# <Sample Name>_<Replicate Letter>_<other text>.txt with replicates
+# <Sample Name>_<other text>.txt without replicates
+REPS_NAME_RE = re.compile(r'^([A-Za-z0-9-.]+)_([A-Za-z0-9]+)')
+NAME_RE = re.compile(r'^([A-Za-z0-9-._]+)')
+
+TIME_RE = re.compile(r'(\d.*?\s.{11})\s+')
+WELL_RE = re.compile(r'(\w\d+)\s+([0-9.]+)')
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def parseTimestamp(text):
+    '''Return seconds of a time stamp using TIME_FORMATS'''
+    text = text.strip()
+    for fmt in TIME_FORMATS:
+        try:
+            stamp = datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return (stamp - EPOCH).total_seconds()
+    raise ValueError('Could not parse time stamp "{}"'.format(text))
+
+
+def readBiolog(fh):
+    '''Read a Biolog kinetic export
+
+    Yields (seconds, [(well, OD), ...]) for each kinetic read.
+    BACKGROUND blocks are skipped.
+    '''
+    background = False
+    seconds = None
+    readings = []
+    for l in fh:
+        # Check for background
+        if 'BACKGROUND' in l:
+            background = True
+            continue
+
+        # Find time point
+        m = TIME_RE.search(l)
+        if m:
+            if seconds is not None:
+                yield seconds, readings
+            background = False
+            seconds = parseTimestamp(m.group(1))
+            readings = []
+            continue
+
+        # Well and OD reading
+        m = WELL_RE.search(l)
+        if m and not background and seconds is not None:
+            readings.append((m.group(1), float(m.group(2))))
+
+    if seconds is not None:
+        yield seconds, readings
+
+
+# Hash of format name->reader
+# A reader takes an open file and yields (seconds, [(well, OD), ...])
+# for each kinetic read in time order
+FORMATS = {'biolog': readBiolog}
+
+
+def registerFormat(name, reader):
+    '''Add a reader for a plate reader export format'''
+    FORMATS[name] = reader
+
+
+def readPlate(filepath):
+    '''Return hash of well->(main source, substrate) from a plate file'''
+    plate = {}
+    f = open(filepath, 'r')
+    for l in f:
+        ll = l.rstrip('\r\n').split('\t')
+        if len(ll) >= 3:
+            plate[ll[0]] = (ll[1], ll[2])
+    f.close()
+    return plate
+
+
+def sampleName(filepath, reps=False):
+    '''Extract sample name from a raw export file name'''
+    fname = os.path.splitext(os.path.basename(filepath))[0]
+    m = (REPS_NAME_RE if reps else NAME_RE).match(fname)
+    if not m:
+        raise ValueError('Could not extract name from {}'.format(filepath))
+    return m.group(1)
+
+
+def wellKey(well):
+    '''Sort key ordering wells by row letter then column number'''
+    m = re.match(r'([A-Za-z]*)(\d*)', well)
+    return m.group(1), int(m.group(2) or 0)
+
+
+def parseFile(filepath, fmt='biolog', reps=False):
+    '''Parse a raw plate reader export
+
+    Returns (sample name, time values, wells, OD matrix). The OD matrix is
+    shaped (wells x timepoints). Time values are hours since the first
+    read, accumulated in 0.1 hour steps as by misc/pmParser.pl.
+    '''
+    name = sampleName(filepath, reps)
+    reader = FORMATS[fmt]
+
+    time = []
+    wellIdx = {}  # Hash of well->row
+    reads = []  # Array of (well rows, OD values) per read
+    prevSeconds = None
+    f = open(filepath, 'r')
+    for seconds, readings in reader(f):
+        if prevSeconds is None:
+            time.append(0.0)
+        else:
+            diff = (seconds - prevSeconds) / 3600.0
+            time.append(float('{:.1f}'.format(time[-1] + diff)))
+        prevSeconds = seconds
+
+        rows = [wellIdx.setdefault(w, len(wellIdx)) for w, od in readings]
+        reads.append((rows, [od for w, od in readings]))
+    f.close()
+
+    # Fill (wells x timepoints) matrix, order wells as A1, A2, ..., H12
+    od = py.zeros((len(wellIdx), len(time)))
+    for tIdx, (rows, ods) in enumerate(reads):
+        od[rows, tIdx] = ods
+    wells = sorted(wellIdx, key=wellKey)
+    return name, time, wells, od[[wellIdx[w] for w in wells]]
+
+
+def buildTable(samples, plate=None):
+    '''Combine parsed exports into a PMData table
+
+    samples is an array of parseFile results. Readings are aligned on the
+    time values of the longest export and missing readings are 0. Returns
+    (header, time, od, lengths) as PMData.parseFile does. Wells missing
+    from the plate hash get the main source "NA" and the well as
+    substrate.
+    '''
+    plate = plate or {}
+    time = []
+    for name, t, wells, od in samples:
+        if len(t) > len(time):
+            time = t
+    timeIdx = {'{:.1f}'.format(t): idx for idx, t in enumerate(time)}
+
+    header = [['sample'], ['mainsource'], ['substrate'], ['well']]
+    blocks = []
+    for name, t, wells, od in samples:
+        # Place readings at the matching time value of the longest export
+        cols = [(idx, timeIdx.get('{:.1f}'.format(x))) for idx, x in
+                enumerate(t)]
+        cols = py.array([c for c in cols if c[1] is not None],
+                        dtype=int).reshape(-1, 2)
+        block = py.zeros((len(wells), len(time)))
+        block[:, cols[:, 1]] = od[:, cols[:, 0]]
+        blocks.append(block)
+
+        for w in wells:
+            source, substrate = plate.get(w, ('NA', w))
+            header[0].append(name)
+            header[1].append(source)
+            header[2].append(substrate)
+            header[3].append(w)
+
+    od = py.concatenate(blocks) if blocks else py.zeros((0, len(time)))
+    return header, time, od, py.repeat(len(time), len(od))
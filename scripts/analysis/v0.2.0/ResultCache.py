@@ -0,0 +1,139 @@
+# ResultCache.py
+# Checkpoint directory of fitted growth curve parameters
+#
+# Author: Daniel A Cuevas
+# Created on 18 Oct. 2026
+# Updated on 18 Oct. 2026
+
+import hashlib
+import os
+import sys
+import zipfile
+import pylab as py
+
+# Bump when fitting changes so that checkpointed results are fitted again
+CACHE_VERSION = 1
+
+
+class ResultCache:
+    '''Fitted growth parameters of replicate groups kept in a directory
+
+    Each group is keyed by a hash of its replicate curves, the time values
+    and the analysis options. The parameters of every fitted batch are
+    written to their own chunk_<n>.npz file as soon as the batch is done,
+    so an interrupted run keeps what it fitted. A re-run, or a run on a
+    file with added or changed groups, only fits groups without a key.
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        self.numLoaded = 0  # Groups taken from the checkpoint
+        self.numStored = 0  # Groups added to the checkpoint
+        self.__index = {}  # Hash of group key->(chunk path, position)
+        self.__chunks = {}  # Hash of chunk path->loaded arrays
+        self.__next = 0  # Number of the next chunk file
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for name in sorted(os.listdir(directory)):
+            if not (name.startswith('chunk_') and name.endswith('.npz')):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                self.__next = max(self.__next, int(name[6:-4]) + 1)
+                with py.load(path) as z:
+                    keys = z['keys']
+            except (IOError, OSError, ValueError, KeyError,
+                    zipfile.BadZipfile):
+                continue
+            for pos, key in enumerate(keys):
+                self.__index[key] = (path, pos)
+
+    def keys(self, data, mask, time, rows, asymWindow, mgrWindow, options,
+             groups=None):
+        '''Return key of each group held in rows of a (curves x replicates
+        x time) array
+
+        asymWindow and mgrWindow are the windows of each group and options
+        is a string of the analysis options. groups, the index of each
+        group in the run, is part of the key when results depend on it, as
+        bootstrap resamples do. Groups are hashed one at a time, so the
+        array is never copied.
+        '''
+        base = hashlib.sha1('{}\n{}\n'.format(CACHE_VERSION, options))
+        base.update(py.ascontiguousarray(time).tostring())
+        keys = []
+        for g, row in enumerate(rows):
+            h = base.copy()
+            h.update(str((asymWindow[g], mgrWindow[g],
+                          None if groups is None else groups[g])))
+            h.update(py.ascontiguousarray(data[row][mask[row]]).tostring())
+            keys.append(h.hexdigest())
+        return py.array(keys, dtype='S40')
+
+    def contains(self, keys):
+        '''Return boolean array of keys found in the checkpoint'''
+        return py.array([k in self.__index for k in keys], dtype=bool)
+
+    def __load(self, path):
+        '''Return hash of name->array of a chunk file'''
+        if path not in self.__chunks:
+            with py.load(path) as z:
+                self.__chunks[path] = {name: z[name] for name in z.files}
+        return self.__chunks[path]
+
+    def get(self, keys):
+        '''Return the GrowthCurve.batchParams hash of found keys'''
+        params = {}
+        paths, positions = zip(*[self.__index[k] for k in keys])
+        paths = py.array(paths)
+        positions = py.array(positions)
+        for path in set(paths):
+            idx = py.flatnonzero(paths == path)
+            for name, values in self.__load(path).items():
+                if name == 'keys' or not values.ndim:
+                    params[name] = values[()]
+                    continue
+                if name not in params:
+                    params[name] = py.empty(len(keys), dtype=values.dtype)
+                params[name][idx] = values[positions[idx]]
+        self.numLoaded += len(keys)
+
+        # Confidence interval bounds are stored as ciLow_<parameter> and
+        # ciHigh_<parameter>
+        for bound in ('ciLow', 'ciHigh'):
+            names = [n for n in params if n.startswith(bound + '_')]
+            params[bound] = {n[len(bound) + 1:]: params.pop(n)
+                             for n in names} or None
+        params['modelSelect'] = params.get('modelSelect') or None
+        params.pop('keys', None)
+        return params
+
+    def put(self, keys, params):
+        '''Write the batchParams hash of groups with keys to a new chunk
+
+        The chunk is written to a temporary file first, so an interrupted
+        write is never read as a chunk.
+        '''
+        arrays = {'keys': py.asarray(keys, dtype='S40'),
+                  'modelSelect': py.array(params['modelSelect'] or '')}
+        for name, values in params.items():
+            if name in ('ciLow', 'ciHigh'):
+                for param, bounds in (values or {}).items():
+                    arrays['{}_{}'.format(name, param)] = bounds
+            elif name != 'modelSelect':
+                arrays[name] = values
+
+        path = os.path.join(self.directory,
+                            'chunk_{}.npz'.format(self.__next))
+        self.__next += 1
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                py.savez(f, **arrays)
+            os.rename(path + '.tmp', path)
+        except (IOError, OSError) as e:
+            print >> sys.stderr, 'Could not write checkpoint {}: {}'.format(
+                path, e)
+            return
+        for pos, key in enumerate(arrays['keys']):
+            self.__index[key] = (path, pos)
+        self.numStored += len(keys)
@@ -0,0 +1,121 @@
+# ResultFiles.py
+# Binary output files of growth curve results
+# Curve parameters are one table, logistic and median curves are
+# (curves x time) matrices in the same order as the table
+#
+# Author: Daniel A Cuevas
+# Created on 18 Oct. 2026
+# Updated on 18 Oct. 2026
+
+import os
+import pylab as py
+from numpy.lib.format import open_memmap
+
+try:
+    import h5py
+    HAVE_H5PY = True
+except ImportError:
+    HAVE_H5PY = False
+
+
+# Label columns of the curve parameter table
+LABEL_NAMES = ['sample', 'mainsource', 'growthcondition', 'well']
+
+
+def infoDtype(labels, names, fmts):
+    '''Return record dtype of the curve parameter table
+
+    labels are the (sample, source, condition, well) tuples of all curves,
+    which set the string widths. names and fmts are the parameter columns
+    and their %-formats: "%s" columns hold model names, the others floats.
+    '''
+    widths = [1] * len(LABEL_NAMES)
+    for label in labels:
+        widths = [max(w, len(str(x))) for w, x in zip(widths, label)]
+    fields = [(n, 'S{}'.format(w)) for n, w in zip(LABEL_NAMES, widths)]
+    fields += [(n, 'S8' if f == '%s' else py.float64)
+               for n, f in zip(names, fmts)]
+    return py.dtype(fields)
+
+
+def infoRecords(dtype, labels, names, columns):
+    '''Return curve parameter table records of labels and columns'''
+    records = py.empty(len(labels), dtype=dtype)
+    for name, values in zip(LABEL_NAMES, zip(*labels)):
+        records[name] = values
+    for name, values in zip(names, columns):
+        records[name] = values
+    return records
+
+
+class NpyWriter:
+    '''Results of one parameter set as .npy files
+
+    curveinfo_<suffix>.npy is a record array with one record per curve,
+    logistic_curves_<suffix>.npy and median_curves_<suffix>.npy are
+    (curves x time) matrices in the same order and time_<suffix>.npy has
+    their time values. Files are filled in place as rows are written and
+    can be loaded memory-mapped with numpy.load(path, mmap_mode='r').
+    '''
+    def __init__(self, outDir, suffix, dtype, numCurves, time, curveDtype):
+        self.dtype = dtype  # Record dtype of the curve parameter table
+        path = os.path.join(outDir, '{}_' + suffix + '.npy')
+        py.save(path.format('time'), py.asarray(time, dtype=float))
+        self.info = open_memmap(path.format('curveinfo'), mode='w+',
+                                dtype=dtype, shape=(numCurves,))
+        self.logistic = open_memmap(path.format('logistic_curves'),
+                                    mode='w+', dtype=curveDtype,
+                                    shape=(numCurves, len(time)))
+        self.median = open_memmap(path.format('median_curves'), mode='w+',
+                                  dtype=curveDtype,
+                                  shape=(numCurves, len(time)))
+
+    def write(self, start, records, logistic, median):
+        '''Store table records and curves from curve start'''
+        s = slice(start, start + len(records))
+        self.info[s] = records
+        self.logistic[s] = logistic
+        self.median[s] = median
+
+    def close(self):
+        '''Flush and release the files'''
+        for m in (self.info, self.logistic, self.median):
+            m.flush()
+        self.info = self.logistic = self.median = None
+
+
+class HDF5Writer:
+    '''Results of one parameter set as an HDF5 file
+
+    curves_<suffix>.h5 has the datasets "curveinfo" (table with one record
+    per curve), "logistic_curves" and "median_curves" ((curves x time)
+    matrices in the same order) and "time". Requires h5py.
+    '''
+    def __init__(self, outDir, suffix, dtype, numCurves, time, curveDtype):
+        self.dtype = dtype  # Record dtype of the curve parameter table
+        self.file = h5py.File(
+            os.path.join(outDir, 'curves_{}.h5'.format(suffix)), 'w')
+        self.file.create_dataset('time', data=py.asarray(time, dtype=float))
+        self.info = self.file.create_dataset('curveinfo', (numCurves,),
+                                             dtype=dtype)
+        self.logistic = self.file.create_dataset(
+            'logistic_curves', (numCurves, len(time)), dtype=curveDtype)
+        self.median = self.file.create_dataset(
+            'median_curves', (numCurves, len(time)), dtype=curveDtype)
+
+    def write(self, start, records, logistic, median):
+        '''Store table records and curves from curve start'''
+        if not len(records):
+            return
+        s = slice(start, start + len(records))
+        self.info[s] = records
+        self.logistic[s] = logistic
+        self.median[s] = median
+
+    def close(self):
+        '''Close the file'''
+        self.file.close()
+
+
+# Hash of output format name->writer class
+WRITERS = {'npy': NpyWriter, 'hdf5': HDF5Writer}
@@ -4,14 +4,28 @@
 #
 # Author: Daniel A Cuevas
 # Created on 22 Nov. 2013
-# Updated on 05 Mar. 2014
+# Updated on 18 Oct. 2026
 
 import argparse
+import pylab as py
 import sys
 import time
 import datetime
 import PMData
+import CurveStore
+import PlateReader
+import ResultFiles
+import ResultCache
 import GrowthCurve
+import Models
+import Kernels
+
+
+# Write buffer size of each curve output file in bytes
+OUTPUT_BUFFER = 1 << 16
+
+# Number of filtered curves formatted at once
+FILTER_CHUNK = 1024
 
 
 ###############################################################################
@@ -31,45 +45,163 @@ def printStatus(msg):
     sys.stderr.flush()
 
 
-def curveFilter(clone, rep, source, cond, curve, pmData):
-    '''Determine if growth curve passes filters'''
-    ODmax = 0.18  # Maximum optical density in first two hours
-    # Only check from 30 minute to 2 hour mark
-    if [x for x in curve[1:5] if x >= ODmax]:
-        # Set filter to True
-        pmData.setFilter(clone, rep, source, cond, True)
-
-
-def printFiltered(pmData):
+def formatBlock(labels, values, fmt='%.3f'):
+    '''Return TSV lines of labels followed by formatted values
+
+    labels holds a tuple of labels for each line and values a sequence of
+    values for each line, such as the rows of a (lines x time) array. fmt
+    is the %-format of every value or a list of one format per column.
+    All lines are formatted by one string operation, giving the same text
+    as formatting each value on its own with str.format.
+    '''
+    if isinstance(values, py.ndarray):
+        values = values.tolist()
+    lineFmts = {}  # Hash of (number of labels, number of values)->format
+    text = []
+    fields = []
+    for label, row in zip(labels, values):
+        if isinstance(row, py.ndarray):
+            row = row.tolist()
+        key = (len(label), len(row))
+        if key not in lineFmts:
+            fmts = fmt if isinstance(fmt, list) else [fmt] * len(row)
+            lineFmts[key] = '%s\t' * len(label) + '\t'.join(fmts) + '\n'
+        text.append(lineFmts[key])
+        fields.extend(label)
+        fields.extend(row)
+    return ''.join(text) % tuple(fields)
+
+
+def printFiltered(pmData, suffix, flags=None):
     '''Print out filtered data'''
     # Get list of filters -- list of tuples
     # Tuple = (clone, source, condition, replicate, [OD values])
-    data = pmData.getFiltered()
+    data = pmData.getFiltered(flags)
     # filter_curve file: curves of filtered samples
-    fhFilter = open('{}/filter_curves_{}.txt'.format(outDir, outSuffix), 'w')
+    fhFilter = open('{}/filter_curves_{}.txt'.format(outDir, suffix), 'w')
     fhFilter.write('sample\treplicate\tmainsource\tgrowthcondition\twell\t')
     fhFilter.write('\t'.join(['{:.1f}'.format(x) for x in pmData.time]))
     fhFilter.write('\n')
-    for tup in data:
-        # Unpack tuple and obtain data
-        clone, source, cond, rep, od = tup
-        well = pmData.wells[source][cond]
-
-        # Print sample information
-        fhFilter.write('{}\t{}\t{}\t{}\t{}\t'.format(clone, rep,
-                                                     source, cond, well))
-        # Print OD readings
-        fhFilter.write('\t'.join(['{:.3f}'.format(x) for x in od]))
-        fhFilter.write('\n')
+
+    # Print sample information and OD readings
+    for start in xrange(0, len(data), FILTER_CHUNK):
+        chunk = data[start:start + FILTER_CHUNK]
+        labels = [(clone, rep, source, cond, pmData.wells[source][cond])
+                  for clone, source, cond, rep, od in chunk]
+        ods = [CurveStore.asFloat64(tup[4], pmData.store.rounded)
+               for tup in chunk]
+        fhFilter.write(formatBlock(labels, ods))
     fhFilter.close()
 
 
+def infoColumns():
+    '''Return (names, %-formats) of the curveinfo parameter columns'''
+    names = ['lag', 'maximumgrowthrate', 'asymptote', 'growthlevel']
+    fmts = ['%.3f'] * 4
+    if modelSelect:
+        names += ['model', 'modellag', 'modelshape', 'sse', 'aic', 'bic']
+        fmts += ['%s', '%.3f', '%.3f', '%.6g', '%.6g', '%.6g']
+    if numBoot:
+        # Bootstrap confidence interval of each curve parameter
+        names += [n + b for n in names[:4] for b in ('low', 'high')]
+        fmts += ['%.3f'] * 8
+    return names, fmts
+
+
+def openCurveFiles(pmData, suffix):
+    '''Open curveinfo, logistic curve and median curve files and print
+    their headers
+
+    Returns the (curveinfo, logistic curves, median curves) file handles.
+    Rows are added with printCurves as their groups are fitted.
+    '''
+    # curveinfo file: curve parameters for each sample
+    fhInfo = open('{}/curveinfo_{}.txt'.format(outDir, suffix), 'w',
+                  OUTPUT_BUFFER)
+    fhInfo.write('sample\tmainsource\tgrowthcondition\twell\t')
+    fhInfo.write('\t'.join(infoColumns()[0]))
+    fhInfo.write('\n')
+
+    # logistic_curve file: logistic curves
+    fhLogCurve = open('{}/logistic_curves_{}.txt'.format(outDir, suffix), 'w',
+                      OUTPUT_BUFFER)
+    fhLogCurve.write('sample\tmainsource\tgrowthcondition\twell\t')
+    fhLogCurve.write('\t'.join(['{:.1f}'.format(x) for x in pmData.time]))
+    fhLogCurve.write('\n')
+
+    # median file: median curves
+    fhMedCurve = open('{}/median_curves_{}.txt'.format(outDir, suffix), 'w',
+                      OUTPUT_BUFFER)
+    fhMedCurve.write('sample\tmainsource\tgrowthcondition\twell\t')
+    fhMedCurve.write('\t'.join(['{:.1f}'.format(x) for x in pmData.time]))
+    fhMedCurve.write('\n')
+    return fhInfo, fhLogCurve, fhMedCurve
+
+
+def printCurves(files, writers, results, rows, labels, start):
+    '''Print out curve parameters, logistic curves and median curves
+
+    files are the openCurveFiles handles or None without TSV output and
+    writers the ResultFiles writers of the parameter set. rows are
+    GrowthCurveResults rows, labels their (clone, source, condition, well)
+    and start the line of the first row in the output of the set. Files
+    are flushed so the rows can be read while the run goes on.
+    '''
+    # Curve parameters in the order of infoColumns
+    names, fmts = infoColumns()
+    columns = [results.lag[rows], results.maxGrowthRate[rows],
+               results.asymptote[rows], results.growthLevel[rows]]
+    if modelSelect:
+        columns += [py.array(Models.MODELS)[results.model[rows]],
+                    results.modelLag[rows], results.modelShape[rows],
+                    results.modelSSE[rows], results.modelAIC[rows],
+                    results.modelBIC[rows]]
+    if numBoot:
+        for name in GrowthCurve.CI_PARAMS:
+            columns += [results.ciLow[name][rows], results.ciHigh[name][rows]]
+
+    # Logistic and median curves are rebuilt from the results
+    logistic = results.logistic(rows)
+    median = results.median(rows)
+
+    if files:
+        # Print sample information with curve parameters, logistic curves
+        # and median curves
+        fhInfo, fhLogCurve, fhMedCurve = files
+        params = zip(*[c.tolist() for c in columns])
+        fhInfo.write(formatBlock(labels, params, fmts))
+        fhLogCurve.write(formatBlock(labels, logistic))
+        fhMedCurve.write(formatBlock(labels, median))
+        for fh in files:
+            fh.flush()
+
+    if writers:
+        records = ResultFiles.infoRecords(writers[0].dtype, labels, names,
+                                          columns)
+        for writer in writers:
+            writer.write(start, records, logistic, median)
+
+
+def printQA(pmData):
+    '''Print out QA check problems'''
+    # qa file: one line per problem found in the input data
+    fhQA = open('{}/qa_{}.txt'.format(outDir, outSuffix), 'w')
+    fhQA.write('sample\treplicate\tmainsource\tgrowthcondition\twell\t')
+    fhQA.write('problem\tcount\n')
+    for clone, rep, source, cond, problem, count in pmData.qaProblems:
+        well = pmData.wells[source][cond] if source else ''
+        fhQA.write('{}\t{}\t{}\t{}\t{}\t{}\t{}\n'.format(
+            clone, rep, source, cond, well, problem, count))
+    fhQA.close()
+
+
 ###############################################################################
 # Argument Parsing
 ###############################################################################
 
 parser = argparse.ArgumentParser()
-parser.add_argument('infile', help='Input PM file')
+parser.add_argument('infile', nargs='+',
+                    help='Input PM file(s) or directory of PM files')
 parser.add_argument('outdir',
                     help='Directory to store output files')
 parser.add_argument('-o', '--outsuffix',
@@ -80,10 +212,90 @@ parser.add_argument('-f', '--filter', action='store_true',
                     help='Apply filtering to growth curves')
 parser.add_argument('-g', '--newgrowth', action='store_true',
                     help='Apply new growth level calculation')
+parser.add_argument('--lagmethod', choices=['grid', 'golden'], default='grid',
+                    help='Lag search: "grid" tries every half time step, '
+                    '"golden" uses a golden-section search. Default is grid')
+parser.add_argument('--lagtol', type=float, default=0.01,
+                    help='Lag tolerance (hours) of the golden-section '
+                    'search. Default is 0.01')
+parser.add_argument('--fullfit', action='store_true',
+                    help='Fit start OD, asymptote, max growth rate and lag '
+                    'jointly by least squares after the lag search')
+parser.add_argument('--modelselect', choices=['aic', 'bic'],
+                    help='Also fit Gompertz and Richards models and report '
+                    'the best model per curve by AIC or BIC')
+parser.add_argument('--backend', choices=['numpy', 'numba'], default='numpy',
+                    help='Growth curve calculations: "numba" uses compiled '
+                    'kernels if Numba is installed. Default is numpy')
+parser.add_argument('--bootstrap', type=int, default=0,
+                    help='Number of replicate resamples for bootstrap '
+                    'confidence intervals. Default is 0 (off)')
+parser.add_argument('--cilevel', type=float, default=0.95,
+                    help='Bootstrap confidence level. Default is 0.95')
+parser.add_argument('--seed', type=int, default=0,
+                    help='Bootstrap random seed. Default is 0')
+parser.add_argument('--precision', choices=['float64', 'float32'],
+                    default='float64',
+                    help='Float type of the stored curves. float32 halves '
+                    'their memory, fits are computed in float64 and give '
+                    'the same output for OD values of at most 6 '
+                    'significant digits. Other values may differ in the '
+                    'last digit. Default is float64')
+parser.add_argument('--max-memory', type=float,
+                    help='Approximate memory in MB used to fit a batch of '
+                    'curves, which sets the batch sizes. Default is to fit '
+                    'all curves in one batch')
+parser.add_argument('--odmax', type=float, nargs='+', default=[0.18],
+                    help='Filter OD threshold(s) used with -f. '
+                    'Default is 0.18')
+parser.add_argument('--asymwindow', type=int, nargs='+', default=[3],
+                    help='Asymptote sliding window size(s). Default is 3')
+parser.add_argument('--mgrwindow', type=int, nargs='+', default=[4],
+                    help='Max growth rate sliding window size(s). '
+                    'Default is 4')
+parser.add_argument('--output-format', nargs='+',
+                    choices=['tsv', 'npy', 'hdf5'], default=['tsv'],
+                    help='Formats of the curve parameter and curve output '
+                    'files. npy and hdf5 files can be read memory-mapped. '
+                    'Default is tsv')
+parser.add_argument('--checkpoint', metavar='DIR',
+                    help='Directory keeping the fitted parameters of every '
+                    'group. A re-run with it only fits groups that are new '
+                    'or changed')
 parser.add_argument('-v', '--verbose', action='store_true',
                     help='Increase output for status messages')
+parser.add_argument('--nocache', action='store_true',
+                    help='Do not read or write the parsed input file cache')
+parser.add_argument('--strict', action='store_true',
+                    help='Stop before processing if the QA check fails')
+parser.add_argument('-j', '--jobs', type=int, default=1,
+                    help='Number of processes to use. Default is 1')
+parser.add_argument('--rawformat', choices=sorted(PlateReader.FORMATS),
+                    help='Input files are raw plate reader exports')
+parser.add_argument('-p', '--plate',
+                    help='Plate file for raw plate reader exports')
+parser.add_argument('--reps', action='store_true',
+                    help='Raw export file names contain a replicate')
+parser.add_argument('--clone', action='append',
+                    help='Only load this clone (can be repeated)')
+parser.add_argument('--source', action='append',
+                    help='Only load this main source (can be repeated)')
+parser.add_argument('--condition', action='append',
+                    help='Only load this growth condition (can be repeated)')
 
 args = parser.parse_args()
+if min(args.asymwindow) < 1 or min(args.mgrwindow) < 2:
+    parser.error('asymptote windows must be at least 1 and max growth '
+                 'rate windows at least 2 data points')
+if args.max_memory is not None and args.max_memory <= 0:
+    parser.error('--max-memory must be positive')
+if args.bootstrap < 0 or not 0 < args.cilevel < 1:
+    parser.error('bootstrap resamples must be at least 0 and the '
+                 'confidence level between 0 and 1')
+if not 0 <= args.seed < 2 ** 32:
+    parser.error('--seed must be between 0 and 2**32 - 1')
+if args.lagtol <= 0:
+    parser.error('--lagtol must be positive')
 inputFile = args.infile
 outSuffix = args.outsuffix if args.outsuffix else 'out'
 outDir = args.outdir
@@ -91,15 +303,56 @@ filterFlag = args.filter
 newGrowthFlag = args.newgrowth
 verbose = args.verbose
 debugOut = args.debug
+useCache = not args.nocache
+numJobs = args.jobs
+strictFlag = args.strict
+lagMethod = args.lagmethod
+lagTol = args.lagtol
+fullFitFlag = args.fullfit
+modelSelect = args.modelselect
+backend = args.backend
+numBoot = args.bootstrap
+ciLevel = args.cilevel
+bootSeed = args.seed
+dtype = py.dtype(args.precision)
+maxMemory = args.max_memory
+outFormats = args.output_format
+checkpointDir = args.checkpoint
+rawFormat = args.rawformat
+platePath = args.plate
+repsFlag = args.reps
+selClones = args.clone
+selSources = args.source
+selConditions = args.condition
+
+# Parameter sets: every combination of filter threshold and window sizes
+# More than one set is a sweep and each set gets its own output files
+odMaxes = args.odmax if filterFlag else args.odmax[:1]
+paramSets = [(odMax, aw, mw) for odMax in odMaxes
+             for aw in args.asymwindow for mw in args.mgrwindow]
+sweepFlag = len(paramSets) > 1
 
 ###############################################################################
 # Data Processing
 ###############################################################################
 
+if backend == 'numba' and not Kernels.HAVE_NUMBA:
+    printStatus('Numba is not installed -- using the NumPy backend.')
+    backend = 'numpy'
+if 'hdf5' in outFormats and not ResultFiles.HAVE_H5PY:
+    printStatus('h5py is not installed -- writing npy files instead.')
+    outFormats = [f for f in outFormats if f != 'hdf5'] + ['npy']
+
 # Parse data file
 printStatus('Parsing input file...')
-pmData = PMData.PMData(inputFile)
+pmData = PMData.PMData(inputFile, useCache, numJobs, rawFormat, platePath,
+                       repsFlag, selClones, selSources, selConditions, dtype)
 printStatus('Parsing complete.')
+# Window sizes can only be checked against the curve length once parsed
+if max(args.asymwindow + args.mgrwindow) > len(pmData.time):
+    parser.error('asymptote and max growth rate windows must not be '
+                 'longer than the {} readings of a curve'.format(
+                     len(pmData.time)))
 if verbose:
     printStatus('Found {} samples and {} growth conditions.'.format(
         pmData.numClones, pmData.numConditions))
@@ -110,28 +363,30 @@ if debugOut:
 
     printStatus('DEBUG: Found {} replicates.'.format(dbug_numReps))
 
+# Write QA check results
+printQA(pmData)
+if pmData.qaProblems:
+    printStatus('QA check found {} problems. See qa_{}.txt.'.format(
+        len(pmData.qaProblems), outSuffix))
+    if strictFlag:
+        printStatus('Stopping: --strict was given.')
+        sys.exit(1)
+elif verbose:
+    printStatus('QA check found no problems.')
+
 
 # Perform filter
+filterFlags = {}  # Hash of OD threshold->filter flags
 if filterFlag:
     printStatus('Performing filtering...')
-    # Iterate through clones
-    for c, repDict in pmData.dataHash.items():
-
-        # Iterate through replicates
-        for rep, sDict in repDict.items():
-
-            # Iterate through media sources
-            for s, condDict in sDict.items():
-
-                # Iterate through growth condtions
-                for cond, odDict in condDict.items():
-
-                    # Perform filter check
-                    curveFilter(c, rep, s, cond, odDict['od'], pmData)
+    # Filter curves with an OD >= odMax from the 30 minute to 2 hour mark
+    for odMax in odMaxes:
+        filterFlags[odMax] = pmData.filterFlags(odMax)
+        if verbose:
+            printStatus('Filtered {} samples at OD {}.'.format(
+                py.count_nonzero(filterFlags[odMax]), odMax))
 
     printStatus('Filtering complete.')
-    if verbose:
-        printStatus('Filtered {} samples.'.format(pmData.numFiltered))
 
 elif verbose:
     printStatus('Filtering option not given -- no filtering performed.')
@@ -139,26 +394,141 @@ elif verbose:
 
 # Create growth curves and logistic models
 printStatus('Processing growth curves and creating logistic models...')
-logData = {}
-# Iterate through clones
-for c in pmData.clones:
-    logData[c] = {}
-
-    # Iterate through media sources
-    for s, condList in pmData.conditions.items():
-        logData[c][s] = {}
-
-        # Iterate through growth conditions
-        for cond in condList:
-            curves = pmData.getCloneReplicates(c, s, cond, filterFlag)
-
-            # Add curve to logData hash
-            # Will not add if:
-            # 1. Filtering is on
-            # 2. All replicates were filtered out
-            if len(curves) > 0:
-                gc = GrowthCurve.GrowthCurve(curves, pmData.time)
-                logData[c][s][cond] = gc
+tensors = {}  # Hash of OD threshold->(curves, mask)
+for odMax in odMaxes:
+    groups, curves, mask = pmData.getReplicateTensor(filterFlag,
+                                                     filterFlags.get(odMax))
+    tensors[odMax] = (curves, mask)
+
+# Stack the replicate groups of every filter threshold
+# Replicates missing at a threshold are padded with NaN
+numGroups = len(groups)
+if len(odMaxes) > 1:
+    numReps = max(mask.shape[1] for curves, mask in tensors.values())
+    curves = py.empty((len(odMaxes) * numGroups, numReps,
+                       len(pmData.time)), dtype=dtype)
+    curves.fill(py.nan)
+    mask = py.zeros((len(odMaxes) * numGroups, numReps), dtype=bool)
+    for odIdx, odMax in enumerate(odMaxes):
+        s = slice(odIdx * numGroups, (odIdx + 1) * numGroups)
+        odCurves, odMask = tensors[odMax]
+        curves[s, :odMask.shape[1]] = odCurves
+        mask[s, :odMask.shape[1]] = odMask
+del tensors
+
+# Window sizes do not change the curves: the groups of every parameter
+# set are rows of the curves of their threshold
+dataRows = py.concatenate([odMaxes.index(odMax) * numGroups +
+                           py.arange(numGroups)
+                           for odMax, aw, mw in paramSets])
+asymWindows = py.repeat([aw for odMax, aw, mw in paramSets], numGroups)
+mgrWindows = py.repeat([mw for odMax, aw, mw in paramSets], numGroups)
+
+# Fit all clone+source+condition replicate groups of all sets at once
+# Groups will not be added if:
+# 1. Filtering is on
+# 2. All replicates were filtered out
+keep = py.any(mask[dataRows], axis=1)
+setOf = py.repeat(py.arange(len(paramSets)), numGroups)[keep]
+groupOf = py.tile(py.arange(numGroups), len(paramSets))[keep]
+dataRows = dataRows[keep]
+asymWindows, mgrWindows = asymWindows[keep], mgrWindows[keep]
+
+# Groups are fitted in batches sized by the memory budget, which is
+# shared by the fitting processes
+batchSize, lagChunk = None, GrowthCurve.LAG_CHUNK
+if maxMemory:
+    batchSize, lagChunk = GrowthCurve.chunkSizes(
+        curves.shape[1], len(pmData.time),
+        maxMemory * 2 ** 20 / max(numJobs, 1))
+    if verbose:
+        printStatus('Fitting {} groups per batch.'.format(batchSize))
+boot = None
+if numBoot:
+    printStatus('Bootstrapping confidence intervals...')
+    boot = (numBoot, ciLevel, bootSeed)
+cache = None
+if checkpointDir:
+    cache = ResultCache.ResultCache(checkpointDir)
+
+# Output order: every parameter set in turn, groups of a set by
+# clone -> media source -> growth condition
+# Labels are kept per group, not per output line, as parameter sets repeat
+# the same groups
+groupLabels = [(c, s, cond, pmData.wells[s][cond]) for c, s, cond in groups]
+outRows = []  # Result row of each output line
+outSets = []  # Parameter set of each output line
+for setIdx in xrange(len(paramSets)):
+    # Add result rows to logData hash
+    # Rows are added clone by clone in the order of the conditions, which
+    # sets the order of the hash and so of the output lines
+    setRows = {groups[groupOf[idx]]: idx
+               for idx in py.flatnonzero(setOf == setIdx)}
+    logData = {}
+    for c in pmData.clones:
+        logData[c] = {}
+        for s, condList in pmData.conditions.items():
+            logData[c][s] = {}
+            for cond in condList:
+                if (c, s, cond) in setRows:
+                    logData[c][s][cond] = setRows[(c, s, cond)]
+
+    for c, sourceDict in logData.items():
+        for s, condDict in sourceDict.items():
+            for cond, row in condDict.items():
+                outRows.append(row)
+                outSets.append(setIdx)
+outRows = py.array(outRows, dtype=int)
+outSets = py.array(outSets, dtype=int)
+
+# Sweep output files are named by their parameter set:
+# <suffix>[_od<threshold>]_a<asymptote window>_m<max growth rate window>
+# Binary output files get one record and curve row per output line
+curveFiles = []
+curveWriters = []
+setStarts = py.searchsorted(outSets, py.arange(len(paramSets)))
+for setIdx, (odMax, aw, mw) in enumerate(paramSets):
+    suffix = outSuffix
+    if sweepFlag:
+        suffix = '{}_a{}_m{}'.format(outSuffix, aw, mw)
+        if filterFlag:
+            suffix = '{}_od{}_a{}_m{}'.format(outSuffix, odMax, aw, mw)
+    files = None
+    if 'tsv' in outFormats:
+        files = openCurveFiles(pmData, suffix)
+    curveFiles.append(files)
+
+    setLabels = [groupLabels[g] for g in groupOf[setOf == setIdx]]
+    infoType = ResultFiles.infoDtype(setLabels, *infoColumns())
+    curveWriters.append([ResultFiles.WRITERS[f](outDir, suffix, infoType,
+                                                len(setLabels),
+                                                pmData.time, dtype)
+                         for f in sorted(set(outFormats) - set(['tsv']))])
+
+# Groups are fitted in output order and printed as each batch is done
+# Only the growth parameters are kept, curves are rebuilt for output
+results = GrowthCurve.GrowthCurveResults(curves, pmData.time, mask,
+                                         dataRows, pmData.store.rounded)
+for s in GrowthCurve.iterFits(results, outRows, asymWindows, mgrWindows,
+                              batchSize, numJobs, boot, cache,
+                              lagMethod=lagMethod, lagTol=lagTol,
+                              fullFit=fullFitFlag, modelSelect=modelSelect,
+                              backend=backend, lagChunk=lagChunk):
+    # A batch may span the end of one parameter set and the next
+    lines = py.arange(len(outRows))[s]
+    for setIdx in py.unique(outSets[lines]):
+        sel = lines[outSets[lines] == setIdx]
+        labels = [groupLabels[g] for g in groupOf[outRows[sel]]]
+        printCurves(curveFiles[setIdx], curveWriters[setIdx], results,
+                    outRows[sel], labels, sel[0] - setStarts[setIdx])
+for files, writers in zip(curveFiles, curveWriters):
+    for fh in files or []:
+        fh.close()
+    for writer in writers:
+        writer.close()
+if cache and verbose:
+    printStatus('Checkpoint: loaded {} groups, stored {} groups.'.format(
+        cache.numLoaded, cache.numStored))
 printStatus('Processing complete.')
 
 
@@ -167,64 +537,13 @@ printStatus('Processing complete.')
 ###############################################################################
 
 printStatus('Printing output files...')
-# curveinfo file: curve parameters for each sample
-fhInfo = open('{}/curveinfo_{}.txt'.format(outDir, outSuffix), 'w')
-fhInfo.write('sample\tmainsource\tgrowthcondition\twell\tlag\t')
-fhInfo.write('maximumgrowthrate\tasymptote\tgrowthlevel\n')
-
-# logistic_curve file: logistic curves
-fhLogCurve = open('{}/logistic_curves_{}.txt'.format(outDir, outSuffix), 'w')
-fhLogCurve.write('sample\tmainsource\tgrowthcondition\twell\t')
-fhLogCurve.write('\t'.join(['{:.1f}'.format(x) for x in pmData.time]))
-fhLogCurve.write('\n')
-
-# median file: median curves
-fhMedCurve = open('{}/median_curves_{}.txt'.format(outDir, outSuffix), 'w')
-fhMedCurve.write('sample\tmainsource\tgrowthcondition\twell\t')
-fhMedCurve.write('\t'.join(['{:.1f}'.format(x) for x in pmData.time]))
-fhMedCurve.write('\n')
-
-# Iterate through clones
-for c, sourceDict in logData.items():
-
-    # Iterate through media sources
-    for s, condDict in sourceDict.items():
-
-        # Iterate through growth conditions
-        for cond, curve in condDict.items():
-            w = pmData.wells[s][cond]
-
-            # Print sample information
-            fhInfo.write('{}\t{}\t{}\t{}\t'.format(c, s, cond, w))
-            fhLogCurve.write('{}\t{}\t{}\t{}\t'.format(c, s, cond, w))
-            fhMedCurve.write('{}\t{}\t{}\t{}\t'.format(c, s, cond, w))
-
-            # Print OD readings
-            lag = curve.lag
-            mgr = curve.maxGrowthRate
-            asymptote = curve.asymptote
-            gLevel = curve.growthLevel
-            fhInfo.write('\t'.join(['{:.3f}'.format(x)
-                                    for x in (lag, mgr, asymptote, gLevel)]))
-            fhInfo.write('\n')
-
-            # Print logistic curves
-            fhLogCurve.write('\t'.join(['{:.3f}'.format(x)
-                                        for x in curve.dataLogistic]))
-            fhLogCurve.write('\n')
-
-            # Print out median curve
-            fhMedCurve.write('\t'.join(['{:.3f}'.format(x)
-                                        for x in curve.dataMed]))
-            fhMedCurve.write('\n')
-
-fhInfo.close()
-fhLogCurve.close()
-fhMedCurve.close()
-
-# Print out filtered data if set
+# Print out filtered data if set, once per threshold of a sweep
 if filterFlag:
-    printFiltered(pmData)
+    for odMax in odMaxes:
+        suffix = outSuffix
+        if sweepFlag:
+            suffix = '{}_od{}'.format(outSuffix, odMax)
+        printFiltered(pmData, suffix, filterFlags[odMax])
 
 printStatus('Printing complete.')
 printStatus('Analysis complete.')
@@ -0,0 +1,118 @@
+#!/usr/bin/python
+# pmbenchmark.py
+# Speed and agreement benchmark of growth curve fitting methods
+#
+# Author: Daniel A Cuevas
+# Created on 18 Oct. 2026
+# Updated on 18 Oct. 2026
+
+import argparse
+import time
+import pylab as py
+import PMData
+import GrowthCurve
+import Kernels
+import Models
+
+
+###############################################################################
+# Utility methods
+###############################################################################
+
+def syntheticCurves(numGroups, numReps, numTime, seed):
+    '''Return (groups x replicates x time) logistic curves with noise'''
+    py.seed(seed)
+    t = py.arange(numTime) * 0.5
+    shape = (numGroups, numReps, 1)
+    A = py.uniform(0.2, 1.2, shape)
+    startOD = py.uniform(0.05, 0.15, shape)
+    mu = py.uniform(0.05, 0.4, shape)
+    lag = py.uniform(1, 10, shape)
+    curves = startOD + (A - startOD) / (1 + py.exp(mu / A * (lag - t) + 2))
+    curves += py.normal(0, 0.01, curves.shape)
+    return py.absolute(curves) + 0.001, t
+
+
+def runBatch(data, t, mask, **kwargs):
+    '''Fit a batch and return (GrowthCurveBatch, seconds)'''
+    start = time.time()
+    batch = GrowthCurve.GrowthCurveBatch(data, t, mask, **kwargs)
+    return batch, time.time() - start
+
+
+def sse(batch):
+    '''SSE of the fitted logistic curves, leaving out the last time point'''
+    diff = batch.dataMed[:, :-1] - batch.dataLogistic[:, :-1]
+    return py.sum(diff ** 2, axis=1)
+
+
+###############################################################################
+# Argument Parsing
+###############################################################################
+
+parser = argparse.ArgumentParser()
+parser.add_argument('infile', nargs='?',
+                    help='PM file to use instead of synthetic curves')
+parser.add_argument('-n', '--numgroups', type=int, default=2000,
+                    help='Number of synthetic replicate groups. '
+                    'Default is 2000')
+parser.add_argument('-t', '--numtime', type=int, default=48,
+                    help='Number of synthetic time points. Default is 48')
+parser.add_argument('--lagtol', type=float, nargs='+',
+                    default=[0.1, 0.01, 0.001],
+                    help='Golden-section lag tolerances to test')
+parser.add_argument('--seed', type=int, default=0,
+                    help='Random seed for synthetic curves')
+args = parser.parse_args()
+
+###############################################################################
+# Benchmark
+###############################################################################
+
+if args.infile:
+    pmData = PMData.PMData(args.infile)
+    groups, data, mask = pmData.getReplicateTensor()
+    t = py.array(pmData.time)
+else:
+    data, t = syntheticCurves(args.numgroups, 2, args.numtime, args.seed)
+    mask = None
+
+grid, gridSec = runBatch(data, t, mask)
+gridSSE = sse(grid)
+numGrid = len(py.arange(t[0], t[-1], (t[1] - t[0]) / 2))
+
+print '{} groups, {} time points'.format(len(data), len(t))
+print '\t'.join(['method', 'tolerance', 'seconds', 'curves/s',
+                 'evaluations', 'median|dlag|', 'max|dlag|',
+                 'sse<=grid'])
+print '\t'.join(['grid', '-', '{:.3f}'.format(gridSec),
+                 '{:.0f}'.format(len(data) / gridSec), str(numGrid),
+                 '-', '-', '-'])
+
+# Compiled kernels: first fit loads or builds them and is not timed
+if Kernels.HAVE_NUMBA:
+    runBatch(data[:1], t, None if mask is None else mask[:1],
+             backend='numba')
+    numba, sec = runBatch(data, t, mask, backend='numba')
+    dlag = py.absolute(numba.lag - grid.lag)
+    better = py.mean(sse(numba) <= gridSSE + 1e-12)
+    print '\t'.join(['grid-numba', '-', '{:.3f}'.format(sec),
+                     '{:.0f}'.format(len(data) / sec), str(numGrid),
+                     '{:.3f}'.format(py.median(dlag)),
+                     '{:.3f}'.format(py.amax(dlag)),
+                     '{:.1%}'.format(better)])
+else:
+    print 'grid-numba\tNumba is not installed'
+
+for tol in args.lagtol:
+    golden, sec = runBatch(data, t, mask, lagMethod='golden', lagTol=tol)
+    dlag = py.absolute(golden.lag - grid.lag)
+    width = 2 * (t[-1] - t[0]) / (Models.GOLDEN_SCAN - 1)
+    numEval = Models.GOLDEN_SCAN + 3 + int(max(
+        py.ceil(py.log(tol / width) / py.log(Models.INVPHI)), 0))
+    better = py.mean(sse(golden) <= gridSSE + 1e-12)
+    print '\t'.join(['golden', str(tol), '{:.3f}'.format(sec),
+                     '{:.0f}'.format(len(data) / sec), str(numEval),
+                     '{:.3f}'.format(py.median(dlag)),
+                     '{:.3f}'.format(py.amax(dlag)),
+                     '{:.1%}'.format(better)])
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+# pmedgetest.py
+# Tests of the pipeline on edge case growth curves
+#
+# Author: Daniel A Cuevas
+# Created on 18 Oct. 2026
+# Updated on 18 Oct. 2026
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import pylab as py
+import GrowthCurve
+import PMData
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def writePMFile(path, cols, od, time):
+    '''Write a PM file
+
+    cols holds the (clone, source, condition, well) of each curve and od
+    the (curves x time) OD values.
+    '''
+    with open(path, 'w') as f:
+        for idx, name in enumerate(['clone', 'source', 'condition', 'well']):
+            f.write('\t'.join([name] + [c[idx] for c in cols]) + '\n')
+        for i, t in enumerate(time):
+            f.write('{:.1f}\t'.format(t))
+            f.write('\t'.join(['{:.3f}'.format(x) for x in od[:, i]]))
+            f.write('\n')
+
+
+def jumpCurves(numTime=48):
+    '''Return (time, 2 replicates jumping from 0.05 to 1.5 after 6 h,
+    2 replicates of a logistic curve)'''
+    t = py.arange(numTime) * 0.5
+    jump = py.where(t <= 6, 0.05, 1.5)
+    logistic = 0.1 + 0.8 / (1 + py.exp(0.3 / 0.9 * (5 - t) + 2))
+    return t, py.array([jump, jump, logistic, logistic])
+
+
+class EdgeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = tempfile.mkdtemp()
+        cls.time, od = jumpCurves()
+        cls.inFile = os.path.join(cls.tmpDir, 'edge.txt')
+        writePMFile(cls.inFile,
+                    [('E1', 'Carbon', 'Jump', 'A1')] * 2 +
+                    [('E1', 'Carbon', 'Logistic', 'A2')] * 2,
+                    od, cls.time)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpDir)
+
+    def runAnalysis(self, *args):
+        '''Run pmanalysis on the edge file, return (exit code, stderr)'''
+        outDir = tempfile.mkdtemp(dir=self.tmpDir)
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(SCRIPT_DIR, 'pmanalysis.py'),
+             self.inFile, outDir, '--nocache'] + list(args),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = proc.communicate()
+        return proc.returncode, err
+
+    def testSingularFit(self):
+        '''Plateaus on both sides of a jump give singular fit systems'''
+        t, od = jumpCurves()
+        data = od.reshape(2, 2, -1)
+        batch = GrowthCurve.GrowthCurveBatch(data, t, fullFit=True)
+        self.assertTrue(py.all(py.isfinite(batch.lag)))
+        code, err = self.runAnalysis('--fullfit', '--bootstrap', '10')
+        self.assertEqual(code, 0, err)
+
+    def testLongWindow(self):
+        '''Asymptote windows longer than the curve leave asymptotes at -1'''
+        t, od = jumpCurves()
+        data = od.reshape(2, 2, -1)
+        batch = GrowthCurve.GrowthCurveBatch(data, t,
+                                             asymWindow=[3, len(t) + 12])
+        self.assertTrue(batch.asymptote[0] > 0)
+        self.assertEqual(batch.asymptote[1], -1)
+        code, err = self.runAnalysis('--asymwindow', '3',
+                                     str(len(t) + 12))
+        self.assertEqual(code, 2)
+        self.assertIn('longer than', err)
+
+    def testEmptySelection(self):
+        '''A selection matching no column gives an empty OD matrix'''
+        header, time, od, lengths = PMData.parseFile(
+            self.inFile, False, (['typo'], None, None))
+        self.assertEqual(od.shape, (0, len(self.time)))
+        self.assertEqual(len(time), len(self.time))
+        code, err = self.runAnalysis('--clone', 'typo')
+        self.assertEqual(code, 0, err)
+
+    def testLagTol(self):
+        '''Lag tolerances must be positive'''
+        for tol in ('0', '-1'):
+            code, err = self.runAnalysis('--lagmethod', 'golden',
+                                         '--lagtol', tol)
+            self.assertEqual(code, 2)
+            self.assertIn('--lagtol', err)
+
+    def testSeed(self):
+        '''Bootstrap seeds must be valid RandomState seeds'''
+        for seed in ('-1', str(2 ** 32)):
+            code, err = self.runAnalysis('--bootstrap', '10', '--seed', seed)
+            self.assertEqual(code, 2)
+            self.assertIn('--seed', err)
+        code, err = self.runAnalysis('--bootstrap', '10',
+                                     '--seed', str(2 ** 32 - 1))
+        self.assertEqual(code, 0, err)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# pmprecisiontest.py
+# Tests that float32 precision gives the output of float64 precision
+#
+# Author: Daniel A Cuevas
+# Created on 18 Oct. 2026
+# Updated on 18 Oct. 2026
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import pylab as py
+from numpy.random import RandomState
+import CurveStore
+import PMData
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# pmanalysis options of each tested run
+RUNS = {'default': ['-f'],
+        'fit': ['-f', '--fullfit', '--modelselect', 'aic', '--bootstrap',
+                '10', '--max-memory', '2', '--asymwindow', '3', '5']}
+
+
+def writePMFile(path, numClones=3, numReps=3, numTime=48, seed=0,
+                fmt='{:.3f}'):
+    '''Write a PM file of noisy logistic curves with 96 conditions
+
+    OD values are written with 3 decimals as in plate reader exports by
+    default.
+    '''
+    rs = RandomState(seed)
+    conds = ([('Carbon', 'C{}'.format(i), 'A{}'.format(i))
+              for i in xrange(48)] +
+             [('Nitrogen', 'N{}'.format(i), 'B{}'.format(i))
+              for i in xrange(48)])
+    cols = [('K{}'.format(c),) + cond for c in xrange(numClones)
+            for cond in conds for r in xrange(numReps)]
+    t = py.arange(numTime) * 0.5
+    shape = (len(cols), 1)
+    A = rs.uniform(0.1, 1.2, shape)
+    startOD = rs.uniform(0.05, 0.2, shape)
+    mu = rs.uniform(0.05, 0.4, shape)
+    lag = rs.uniform(1, 10, shape)
+    od = startOD + (A - startOD) / (1 + py.exp(mu / A * (lag - t) + 2))
+    od = py.absolute(od + rs.normal(0, 0.01, od.shape)) + 0.001
+
+    with open(path, 'w') as f:
+        for idx, name in enumerate(['clone', 'source', 'condition', 'well']):
+            f.write('\t'.join([name] + [c[idx] for c in cols]) + '\n')
+        for i in xrange(numTime):
+            f.write('{:.1f}\t'.format(t[i]))
+            f.write('\t'.join([fmt.format(x) for x in od[:, i]]))
+            f.write('\n')
+
+
+class PrecisionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = tempfile.mkdtemp()
+        cls.inFile = os.path.join(cls.tmpDir, 'pm.txt')
+        writePMFile(cls.inFile)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpDir)
+
+    def runAnalysis(self, name, precision):
+        '''Run pmanalysis and return its output directory'''
+        outDir = os.path.join(self.tmpDir, '{}_{}'.format(name, precision))
+        os.mkdir(outDir)
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(
+                [sys.executable, os.path.join(SCRIPT_DIR, 'pmanalysis.py'),
+                 self.inFile, outDir, '-o', 'test', '--nocache',
+                 '--precision', precision] + RUNS[name],
+                stdout=devnull, stderr=devnull)
+        return outDir
+
+    def testOutput(self):
+        '''Output files of both precisions are identical'''
+        for name in sorted(RUNS):
+            dir64 = self.runAnalysis(name, 'float64')
+            dir32 = self.runAnalysis(name, 'float32')
+            files = sorted(os.listdir(dir64))
+            self.assertEqual(files, sorted(os.listdir(dir32)))
+            self.assertTrue([f for f in files if f.startswith('curveinfo')])
+            for fname in files:
+                with open(os.path.join(dir64, fname)) as f64:
+                    with open(os.path.join(dir32, fname)) as f32:
+                        self.assertEqual(f64.read(), f32.read(),
+                                         '{} differs in run {}'.format(
+                                             fname, name))
+
+    def testMemory(self):
+        '''float32 halves the OD matrix and the replicate tensor'''
+        nbytes = {}
+        for dtype in (py.float64, py.float32):
+            pmData = PMData.PMData(self.inFile, useCache=False, dtype=dtype)
+            groups, curves, mask = pmData.getReplicateTensor()
+            nbytes[dtype] = (pmData.store.od.nbytes, curves.nbytes)
+        for b64, b32 in zip(nbytes[py.float64], nbytes[py.float32]):
+            self.assertAlmostEqual(float(b32) / b64, 0.5, places=2)
+
+    def testRounding(self):
+        '''float32 values are rounded only if no value has over 6 digits'''
+        longFile = os.path.join(self.tmpDir, 'pm7.txt')
+        writePMFile(longFile, numClones=1, fmt='{:.7f}')
+        for path, rounded in ((self.inFile, True), (longFile, False)):
+            pmData = PMData.PMData(path, useCache=False, dtype=py.float32)
+            self.assertEqual(pmData.store.rounded, rounded)
+            od64 = PMData.PMData(path, useCache=False).store.od
+            od32 = pmData.store.od
+            widened = CurveStore.asFloat64(od32, pmData.store.rounded)
+            if rounded:
+                self.assertTrue(py.array_equal(widened, od64))
+            else:
+                self.assertTrue(py.array_equal(widened, od32))
+                self.assertFalse(py.array_equal(
+                    CurveStore.asFloat64(od32, True), od64))
+
+
+if __name__ == '__main__':
+    unittest.main()